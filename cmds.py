@@ -1,4 +1,4 @@
-#!/usr/bin/python2
+#!/usr/bin/env python3
 #
 # LinuxCNC interface for serial terminals
 #
@@ -16,32 +16,149 @@
 ### FIXME - check linuxcnc modes before executing commands.
 
 # built-in modules
-import sys, string, time
-import traceback
-import curses
+import time
+import types
 
 # program specific modules
 import linuxcnc
-import gcode
+
+# bind the linuxcnc constants used on keystroke paths once at import;
+# a module global is one dict lookup instead of a LOAD_GLOBAL plus
+# LOAD_ATTR into the extension module on every call
+_MODE_MANUAL = linuxcnc.MODE_MANUAL
+_MODE_MDI = linuxcnc.MODE_MDI
+_MODE_AUTO = linuxcnc.MODE_AUTO
+_STATE_ON = linuxcnc.STATE_ON
+_STATE_OFF = linuxcnc.STATE_OFF
+_STATE_ESTOP_RESET = linuxcnc.STATE_ESTOP_RESET
+_INTERP_IDLE = linuxcnc.INTERP_IDLE
+_INTERP_PAUSED = linuxcnc.INTERP_PAUSED
+_TRAJ_MODE_TELEOP = linuxcnc.TRAJ_MODE_TELEOP
+_JOG_INCREMENT = linuxcnc.JOG_INCREMENT
+_AUTO_RUN = linuxcnc.AUTO_RUN
+_AUTO_PAUSE = linuxcnc.AUTO_PAUSE
+_AUTO_RESUME = linuxcnc.AUTO_RESUME
+_SPINDLE_INCREASE = linuxcnc.SPINDLE_INCREASE
+_SPINDLE_DECREASE = linuxcnc.SPINDLE_DECREASE
+
+# dispatch and toggle tables, built once at import so keystroke
+# handlers do a dict lookup instead of an if/elif chain with repeated
+# linuxcnc attribute lookups
+_SPINDLE_DISP = {
+  1: (linuxcnc.SPINDLE_FORWARD, 1),
+  -1: (linuxcnc.SPINDLE_REVERSE, 1),
+  0: (linuxcnc.SPINDLE_OFF, 0),
+}
+_SPINDLE_DEFAULT = _SPINDLE_DISP[0]
+# the coolant constants are small ints, so xor-ing the current state
+# against ON^OFF flips it branchlessly; STATE_ON/STATE_OFF need not be
+# adjacent, so machine() keeps a dict
+_MIST_XOR = linuxcnc.MIST_ON ^ linuxcnc.MIST_OFF
+_FLOOD_XOR = linuxcnc.FLOOD_ON ^ linuxcnc.FLOOD_OFF
+_STATE_TOGGLE = {_STATE_ON: _STATE_OFF}
+_FEED_SCALE = 0.01 # percentage -> [0,1]; multiply beats divide
+
+# cached ok_for_mdi() result; see poll_invalidate() and ok_for_mdi()
+_mdi_cache = {"key": None, "val": False}
+
+# frozen status snapshot shared by all commands in one poll cycle
+_stat_snap = None
+
+# drop cached status-derived results; call after every ui.stat.poll()
+# in the main loop so stale answers never outlive a poll cycle
+def poll_invalidate():
+  global _stat_snap
+  _mdi_cache["key"] = None
+  _stat_snap = None
+
+# one frozen copy of the status fields the commands read, built at most
+# once per poll cycle; every attribute access on ui.stat goes back to
+# the NML status buffer, so read it once and share the copy
+def _snapshot(ui):
+  global _stat_snap
+  if _stat_snap is None:
+    s = ui.stat
+    _stat_snap = types.SimpleNamespace(
+      task_mode=s.task_mode, task_state=s.task_state,
+      interp_state=s.interp_state, motion_mode=s.motion_mode,
+      mist=s.mist, flood=s.flood, homed=s.homed, joints=s.joints,
+      estop=s.estop, enabled=s.enabled, block_delete=s.block_delete,
+      optional_stop=s.optional_stop, max_velocity=s.max_velocity)
+  return _stat_snap
+
+# report an error, but drop repeats of the same message arriving
+# inside a short window; a held jog key with no axis selected otherwise
+# redraws the status line on every key repeat
+def _err_rate_limited(ui, msg, dt=0.25):
+  now = time.monotonic()
+  if msg == ui.last_err and now - ui.last_err_t < dt:
+    return
+  ui.last_err = msg
+  ui.last_err_t = now
+  ui.error_msg(msg)
+
+# true if every joint is homed; generator form so the scan stops at the
+# first un-homed joint instead of walking all the homed slots
+def _all_homed(s):
+  h = s.homed
+  return all(h[i] for i in range(s.joints))
+
+# switch task mode without blocking the curses loop; the switch is
+# fired and recorded as pending, and check_pending() (called from the
+# main loop after each status poll) runs the follow-up action once the
+# task reports the new mode.  If already in the requested mode the
+# follow-up runs immediately.
+def _switch_mode(ui, m, then=None):
+  s = ui.stat
+  s.poll()
+  poll_invalidate() # fresh status invalidates the shared snapshot
+  if s.task_mode == m:
+    ui.pending_mode = None
+    ui.pending_action = None
+    if then:
+      then()
+    return
+  ui.cmd.mode(m)
+  ui.pending_mode = m
+  ui.pending_action = then
+
+# fire the deferred follow-up once a pending mode switch completes;
+# called from the main loop right after ui.stat.poll()
+def check_pending(ui):
+  pending = ui.pending_mode
+  if pending is None:
+    return
+  if ui.stat.task_mode == pending:
+    action = ui.pending_action
+    ui.pending_mode = None
+    ui.pending_action = None
+    if action:
+      action()
 
 # ABORT ABORT ABORT!!!
+# drop any pending mode switch or follow-up first, so the abort is
+# never stuck behind queued work
 def abort(ui):
+  ui.pending_mode = None
+  ui.pending_action = None
   ui.cmd.abort()
 
 # toggle block delete
 def block_delete(ui):
-  if ui.stat.block_delete:
-    ui.cmd.set_block_delete(0) # 0 is off?
-  else:
-    ui.cmd.set_block_delete(1)
+  ui.cmd.set_block_delete((1 if _snapshot(ui).block_delete else 0) ^ 1)
+
+# toggle optional stop
+def opt_stop(ui):
+  ui.cmd.set_optional_stop((1 if _snapshot(ui).optional_stop else 0) ^ 1)
 
 # home currently selected axis
 def home_axis(ui):
-  if ui.axis == None:
-    ui.error_msg("No axis selected for homing!")
+  axis = ui.axis
+  if axis is None:
+    _err_rate_limited(ui, "No axis selected for homing!")
     return
   else:
-    ui.cmd.home(ui.axis)
+    ui.cmd.home(axis)
 
 # home all axes
 def home_all(ui):
@@ -52,60 +169,64 @@ def home_all(ui):
 # if ui.axis or ui.joint == None, then no
 # axes enabled for jogging or homing!!!
 def joint(ui):
-  if ui.axis == None or ui.joint == None:
-    ui.error_msg("No axis selected for motion!")
+  axis = ui.axis; jnt = ui.joint
+  if axis is None or jnt is None:
+    _err_rate_limited(ui, "No axis selected for motion!")
+    return
+  # the teleop/free decision only changes on home/un-home events, so
+  # skip the NML round-trip when the last one issued still matches;
+  # step_jog calls here on every jog increment
+  desired = _all_homed(_snapshot(ui))
+  if desired == ui.last_teleop_homed:
     return
-  if ui.stat.homed.count(1) == ui.stat.joints: # all homed, enable teleop
-    ui.cmd.teleop_enable(1); # axis jogging, not individual joints!
+  c = ui.cmd
+  if desired: # all homed, enable teleop
+    c.teleop_enable(1); # axis jogging, not individual joints!
   else:
-    ui.cmd.teleop_enable(0); # free/joint jogging, not axes!
+    c.teleop_enable(0); # free/joint jogging, not axes!
+  ui.last_teleop_homed = desired
 
 # perform a single jog increment, multiplied by f (negative for reverse)
 def step_jog(ui, f):
-  if ui.axis == None or ui.joint == None:
-    ui.error_msg("No axis selected for motion!")
+  axis = ui.axis; jnt = ui.joint
+  if axis is None or jnt is None:
+    _err_rate_limited(ui, "No axis selected for motion!")
     return
   joint(ui)
-  if ui.stat.motion_mode == linuxcnc.TRAJ_MODE_TELEOP:
-    ui.cmd.jog(linuxcnc.JOG_INCREMENT, True, ui.axis, ui.stat.max_velocity, ui.jog_step*f)
+  s = _snapshot(ui)
+  c = ui.cmd
+  step = ui.jog_step*f
+  if s.motion_mode == _TRAJ_MODE_TELEOP:
+    c.jog(_JOG_INCREMENT, True, axis, s.max_velocity, step)
   else:
-    ui.cmd.jog(linuxcnc.JOG_INCREMENT, False, ui.joint, ui.stat.max_velocity, ui.jog_step*f)
+    c.jog(_JOG_INCREMENT, False, jnt, s.max_velocity, step)
 
 # start, stop, fwd, rev:
 # flag = -1 ==> reverse
 # flag =  0 ==> stop
 # flag = +1 ==> forward
 def spindle(ui, flag):
-  if not ui.stat.task_mode == linuxcnc.MODE_MANUAL:
-    ui.error_msg("Must be in MANUAL mode!")
+  if not _snapshot(ui).task_mode == _MODE_MANUAL:
+    _err_rate_limited(ui, "Must be in MANUAL mode!")
     return
-  if flag == 0:
-    ui.cmd.spindle(linuxcnc.SPINDLE_OFF, 0, ui.spindle)
-  elif flag == 1:
-    ui.cmd.spindle(linuxcnc.SPINDLE_FORWARD, 1, ui.spindle)
-  elif flag == -1:
-    ui.cmd.spindle(linuxcnc.SPINDLE_REVERSE, 1, ui.spindle)
-  else:
-    ui.cmd.spindle(linuxcnc.SPINDLE_OFF, 0, ui.spindle)
+  (action, speed) = _SPINDLE_DISP.get(flag, _SPINDLE_DEFAULT)
+  ui.cmd.spindle(action, speed, ui.spindle)
 
 def spindle_plus(ui):
-  if not ui.stat.task_mode == linuxcnc.MODE_MANUAL:
-    ui.error_msg("Must be in MANUAL mode!")
+  if not _snapshot(ui).task_mode == _MODE_MANUAL:
+    _err_rate_limited(ui, "Must be in MANUAL mode!")
     return
-  ui.cmd.spindle(linuxcnc.SPINDLE_INCREASE, ui.spindle)
+  ui.cmd.spindle(_SPINDLE_INCREASE, 0, ui.spindle) # (direction, value, spindle)
 
 def spindle_minus(ui):
-  if not ui.stat.task_mode == linuxcnc.MODE_MANUAL:
-    ui.error_msg("Must be in MANUAL mode!")
+  if not _snapshot(ui).task_mode == _MODE_MANUAL:
+    _err_rate_limited(ui, "Must be in MANUAL mode!")
     return
-  ui.cmd.spindle(linuxcnc.SPINDLE_DECREASE, ui.spindle)
+  ui.cmd.spindle(_SPINDLE_DECREASE, 0, ui.spindle) # (direction, value, spindle)
 
 # toggle machine on, off
 def machine(ui):
-  if ui.stat.task_state == linuxcnc.STATE_ON:
-    ui.cmd.state(linuxcnc.STATE_OFF)
-  else:
-    ui.cmd.state(linuxcnc.STATE_ON)
+  ui.cmd.state(_STATE_TOGGLE.get(_snapshot(ui).task_state, _STATE_ON))
 
 # reset interpreter
 def reset(ui):
@@ -113,73 +234,68 @@ def reset(ui):
 
 # run current program in auto mode
 def run(ui):
-  if not ui.stat.task_mode == linxucnc.MODE_AUTO:
+  if not _snapshot(ui).task_mode == _MODE_AUTO:
     ui.error_msg("Must be in AUTO mode!")
     return
   #### FIXME
   # check if single block set, then STEP?
-  ui.cmd.auto(linuxcnc.AUTO_RUN)
+  ui.cmd.auto(_AUTO_RUN)
 
 # pause running program
 def pause(ui):
-  if ui.stat.interp_state == linuxcnc.INTERP_PAUSED:
-    ui.cmd.auto(linuxcnc.AUTO_RESUME)
+  if _snapshot(ui).interp_state == _INTERP_PAUSED:
+    ui.cmd.auto(_AUTO_RESUME)
   else:
-    ui.cmd.auto(linuxcnc.AUTO_PAUSE)
+    ui.cmd.auto(_AUTO_PAUSE)
 
 # go to manual mode
 def manual(ui):
-  ui.cmd.mode(linuxcnc.MODE_MANUAL)
-  ui.cmd.wait_complete() # wait until mode switch executed
+  _switch_mode(ui, _MODE_MANUAL)
 
 # toggle mist coolant
 def mist(ui):
-  if ui.stat.mist == linuxcnc.MIST_ON:
-    ui.cmd.mist(linuxcnc.MIST_OFF)
-  else:
-    ui.cmd.mist(linuxcnc.MIST_ON)
+  ui.cmd.mist(_snapshot(ui).mist ^ _MIST_XOR)
 
 # toggle flood coolant
 def flood(ui):
-  if ui.stat.flood == linuxcnc.FLOOD_ON:
-    ui.cmd.flood(linuxcnc.FLOOD_OFF)
-  else:
-    ui.cmd.flood(linuxcnc.FLOOD_ON)
+  ui.cmd.flood(_snapshot(ui).flood ^ _FLOOD_XOR)
 
 def override_lims(ui):
-  override = False;
-  for i in range(len(ui.stat.joint)):
-    if ui.stat.joint[i]["override_limits"]:
-      override = True
+  # only scan the configured joints (the stat buffer always carries 9),
+  # and stop at the first overridden one
+  s = ui.stat
+  joints = s.joint
+  override = any(joints[i]["override_limits"] for i in range(s.joints))
   ui.cmd.override_limits();
-  if override:
-    ui.limits_override = False;
-  else:
-    ui.limits_override = True;
+  ui.limits_override = not override
 
 # reset estop
 def estop_reset(ui):
-  ui.cmd.state(linuxcnc.STATE_ESTOP_RESET)
+  ui.cmd.state(_STATE_ESTOP_RESET)
 
 # mdi mode
 def mdi_mode(ui):
-  if ok_for_mdi(ui.stat):
-    ui.cmd.mode(linuxcnc.MODE_MDI)
-    ui.cmd.wait_complete() # wait until mode switch executed
+  if ok_for_mdi(_snapshot(ui)):
+    _switch_mode(ui, _MODE_MDI)
   else:
     ui.error_msg("Not ready for MDI input!")
 
 # automatic mode
 def automatic(ui):
-  ui.cmd.mode(linuxcnc.MODE_AUTO)
-  ui.cmd.wait_complete() # wait until mode switch executed
+  _switch_mode(ui, _MODE_AUTO)
+
+# submit an MDI command with no state prechecks; for callers that have
+# already validated the machine state (and mode) themselves
+def _mdi_unchecked(ui, string):
+  ui.cmd.mdi(string)
 
 def mdi(ui, string):
-  if ok_for_mdi(ui.stat):
-    if ui.stat.task_mode != linuxcnc.MODE_MDI:
+  s = _snapshot(ui)
+  if ok_for_mdi(s):
+    if s.task_mode != _MODE_MDI:
       ui.error_msg("Must be in MDI mode!")
       return
-    ui.cmd.mdi(string)
+    _mdi_unchecked(ui, string)
   else:
     ui.error_msg("Not ready for MDI input!")
 
@@ -189,16 +305,23 @@ def load_tool_table(ui):
 
 # send an MDI command to reset current position offsets
 def set_coordinates(ui, string):
-  cmd="G10 L20 P0 %s"%string
-  if ui.stat.task_mode != linuxcnc.MODE_MDI:
-    ui.cmd.mode(linuxcnc.MODE_MDI)
-    ui.cmd.wait_complete() # wait until mode switch executed
-  ui.cmds.mdi(cmd)
+  cmd=f"G10 L20 P0 {string}" # f-string skips the % format parser
+  # submit the MDI once the mode switch completes; no blocking wait,
+  # and no redundant ok_for_mdi recheck -- the caller just proved it
+  _switch_mode(ui, _MODE_MDI, lambda: _mdi_unchecked(ui, cmd))
 
+# ok_for_mdi runs on every MDI keystroke, so cache the answer; the key
+# is every status field the check reads, and the cache is flushed by
+# poll_invalidate() when the main loop polls fresh status
 def ok_for_mdi(s):
-  return not s.estop and s.enabled and (s.homed.count(1) == s.joints) and (s.interp_state == linuxcnc.INTERP_IDLE)
+  key = (s.estop, s.enabled, s.interp_state, s.joints, s.homed)
+  if key == _mdi_cache["key"]:
+    return _mdi_cache["val"]
+  val = not s.estop and s.enabled and _all_homed(s) and (s.interp_state == _INTERP_IDLE)
+  _mdi_cache["key"] = key
+  _mdi_cache["val"] = val
+  return val
 
 # rate is feed rate percentage, 0-100+
 def feedrate(ui, rate):
-  ui.cmd.feedrate(rate/100.0) # scale to [0,1]
-  ui.cmd.wait_complete() # wait until mode switch executed
+  ui.cmd.feedrate(rate * _FEED_SCALE) # scale to [0,1]; no mode switch, so no wait needed
@@ -1,4 +1,4 @@
-#!/usr/bin/python2
+#!/usr/bin/env python3
 #
 # LinuxCNC interface for serial terminals
 #
@@ -29,7 +29,10 @@
 
 
 # built-in modules
-import sys, string, time
+import sys, time
+import select
+import mmap
+import subprocess
 import traceback
 import curses
 import curses.ascii
@@ -42,14 +45,34 @@ import hal
 import gcode
 import cmds
 import curses_dialog # dialog boxes for input
+
+# bind hot linuxcnc constants once; saves a module attribute lookup on
+# every use in the poll and repaint paths
+_INTERP_IDLE = linuxcnc.INTERP_IDLE
+_STATE_ON = linuxcnc.STATE_ON
+_MODE_MANUAL = linuxcnc.MODE_MANUAL
+_MODE_MDI = linuxcnc.MODE_MDI
+_MODE_AUTO = linuxcnc.MODE_AUTO
+_TRAJ_MODE_COORD = linuxcnc.TRAJ_MODE_COORD
+_TRAJ_MODE_FREE = linuxcnc.TRAJ_MODE_FREE
+_TRAJ_MODE_TELEOP = linuxcnc.TRAJ_MODE_TELEOP
+_FLOOD_ON = linuxcnc.FLOOD_ON
+_MIST_ON = linuxcnc.MIST_ON
+_NML_ERROR = linuxcnc.NML_ERROR
+_OPERATOR_ERROR = linuxcnc.OPERATOR_ERROR
 from hal_interface import HALInterface # HAL pins, etc.
 
 class Interface:
   def __init__(self):
     self.tabs = ["Default", "Program", "Status", "Tools"]
+    # column of each tab header, computed once rather than per frame
+    self.tab_offsets = [i*80//len(self.tabs) for i in range(len(self.tabs))]
+    # coordinate system names indexed by g5x_index-1
+    self.cs_map = ("G54","G55","G56","G57","G58","G59","G59.1","G59.2","G59.3")
     self.tab = 0
     self.s = None # curses window object for the whole screen
-    self.sleep = 0.3 # sleep period, in seconds
+    self.sleep = 0.3 # status poll period, in seconds
+    self.redraw = 0.6 # full screen repaint period, in seconds
     self.maxx = 0
     self.maxy = 0
     self.ini = None # linuxcnc ini file object
@@ -65,7 +88,15 @@ class Interface:
     self.axis = None # selected axis
     self.joint = None # selected joint
     self.limits_override = False # True if limits being overridden
+    self.last_teleop_homed = None # last all-homed state sent as teleop_enable
+    self.pending_mode = None # task mode switch awaiting completion
+    self.pending_action = None # follow-up to run when the switch lands
+    self.last_err = None # last rate-limited error message
+    self.last_err_t = 0.0 # and when it was shown
     self.listing = [] # program listing lines
+    self.listing_cache = {} # (line index, width) -> formatted listing row
+    self.tools_fmt = [] # tool rows pre-formatted by parse_tools()
+    self.axis_line_cache = [None]*5 # (inputs, line) per axis row, see default_tab
     self.inch = True; # machine is inch or mm
     self.g20 = True; # g code in inch or mm
     self.axis_ltrs = [] # fill from ini file TRAJ/COORDINATES
@@ -78,9 +109,12 @@ class Interface:
     self.tools = [] # tool table, missing empty entries from stat.tool_table
     self.program_start = 0 # program listing start index
     self.tool_start = 0 # tool listing start index
+    self.row_cache = {} # (y,x) -> (text, attr) last drawn, for put()
+    self.last_tab_fp = None # (tab, fingerprint) of the last tab body drawn
+    self.tool_serial = 0 # bumped by parse_tools so the tool tab redraws
 
   def error_msg(self, msg):
-    self.olderr = (linuxcnc.OPERATOR_ERROR, msg)
+    self.olderr = (_OPERATOR_ERROR, msg)
   
   def text_msg(self, msg):
     self.olderr = (linuxcnc.OPERATOR_TEXT, msg)
@@ -97,6 +131,10 @@ def main():
   #
   # Setup linuxcnc streams
   #
+  # line-buffer stderr so each diagnostic line is one write() syscall,
+  # not one per call; matters on a slow serial console
+  sys.stderr.reconfigure(line_buffering=True)
+
   ui = Interface()
   # ui.stat is linuxcnc.stat()
   # ui.cmd is linuxcnc.command()
@@ -108,6 +146,7 @@ def main():
   sys.stderr.write("CNCTERM: starting up, inifile %s\n"%inifile)
   ui.ini = linuxcnc.ini(inifile)
   ui.sleep = float(ui.ini.find("EMCIO", "CYCLE_TIME")) or 0.1
+  ui.redraw = 2*ui.sleep # repaint less often than we poll
 
   unit = ui.ini.find("TRAJ", "LINEAR_UNITS")
   if unit:
@@ -140,7 +179,9 @@ def main():
     sys.exit(0)
 
   # add hal pins, for jogging by wheel, and for buttons and lights
-  ui.hal = HALInterface(ui.cmd, ui.stat)
+  # route the abort pin through cmds.abort so a queued mode-switch
+  # follow-up can't fire after the operator hits the physical abort
+  ui.hal = HALInterface(ui.cmd, ui.stat, lambda: cmds.abort(ui))
 
   ui.hal.poll()
   ui.stat.poll()
@@ -156,14 +197,14 @@ def main():
   cycle_jog_steps() # start at last jog increment, update for mm
 
   #
-  # run post-gui hal file, to setup MPG, etc.
+  # run setup and post-gui hal files, to setup MPG, etc.
+  # halcmd only honors one -f per invocation, so each file gets its own
   sys.stderr.write("CNCTERM: HAL pins created, running cncterm.hal...\n")
-  os.spawnvp(os.P_WAIT, "halcmd", ["halcmd", "-f", "cncterm.hal"])
-
+  subprocess.run(["halcmd", "-i", inifile, "-f", "cncterm.hal"])
   pg_halfile = ui.ini.find("HAL", "POSTGUI_HALFILE")
   if pg_halfile:
-    sys.stderr.write("CNCTERM: Running post-gui hal file '%s'...\n"%pg_halfile)
-    os.spawnvp(os.P_WAIT, "halcmd", ["halcmd", "-i",inifile,"-f", pg_halfile])
+    sys.stderr.write("CNCTERM: running post-gui hal file '%s'...\n"%pg_halfile)
+    subprocess.run(["halcmd", "-i", inifile, "-f", pg_halfile])
 
   #
   # Init curses, set up basic format
@@ -173,12 +214,16 @@ def main():
   curses.noecho()
   curses.cbreak()
   ui.s.nodelay(1)
+  # let curses defer screen updates while input is pending, so a burst
+  # of keystrokes costs one repaint instead of one per key
+  curses.typeahead(sys.stdin.fileno())
   # interpret special keys in curses to constants
   ui.s.keypad(True)
 
 
   # get size of screen
   (ui.maxy, ui.maxx) = ui.s.getmaxyx()
+  _recompute_layout()
 
   # Map it
   ui.s.refresh()
@@ -191,40 +236,63 @@ def main():
   ui.display_msg("Done.")
   cls()
 
-  # main loop
+  # main loop; polling and repainting run on separate cadences, and the
+  # select() sleeps precisely until the next deadline or a keypress
+  last_poll = 0.0
+  last_redraw = 0.0
   while(1):
-    # update hal
-    ui.hal.poll()
-    # poll current status
-    ui.stat.poll()
-
-    # current linuxcnc module does not have the G_xx constants like it should
-    # determine if currently processing blocks as metric or inch
-    if 200 in ui.stat.gcodes: # inch mode
-      ui.g20 = True;
-    elif 210 in ui.stat.gcodes: # mm mode
-      ui.g20 = False;
-    else: # problem if not in either mode
-      sys.stderr.write("CNCTERM: FATAL ERROR: Current G codes has neither G20 or G21! DIE!\n");
-      sys.exit(1)
-
-    # handle commands, if any
-    dispatcher()
-
-    # update jogging status, etc.
-    if ui.axis != None:
-      # turn on jogging if nothing running
-      if ui.stat.queue==0 and ui.stat.interp_state == linuxcnc.INTERP_IDLE:
-        ui.jogging = True
-	ui.hal.jog_active(True)
-	ui.hal.set_axis(ui.axis)
-      else:
-        ui.hal.jog_active(False)
+    now = time.time()
+
+    if now - last_poll >= ui.sleep:
+      last_poll = now
+      # update hal
+      ui.hal.poll()
+      # poll current status
+      ui.stat.poll()
+      cmds.poll_invalidate() # fresh status, so flush cached answers
+      cmds.check_pending(ui) # fire follow-ups of completed mode switches
+
+      # current linuxcnc module does not have the G_xx constants like it should
+      # determine if currently processing blocks as metric or inch
+      if 200 in ui.stat.gcodes: # inch mode
+        ui.g20 = True;
+      elif 210 in ui.stat.gcodes: # mm mode
+        ui.g20 = False;
+      else: # problem if not in either mode
+        sys.stderr.write("CNCTERM: FATAL ERROR: Current G codes has neither G20 or G21! DIE!\n");
+        sys.exit(1)
+
+      # update jogging status, etc.
+      if ui.axis != None:
+        # turn on jogging if nothing running
+        if ui.stat.queue==0 and ui.stat.interp_state == _INTERP_IDLE:
+          ui.jogging = True
+          ui.hal.jog_active(True)
+          ui.hal.set_axis(ui.axis)
+        else:
+          ui.hal.jog_active(False)
+
+    # repaint on its own, slower cadence; the tab fingerprints make a
+    # no-change repaint cheap, so keystroke echo stays snappy
+    if now - last_redraw >= ui.redraw:
+      last_redraw = now
+      cls()
 
-    # refresh the screen
-    cls()
-    # delay for a bit, to suck less CPU
-    time.sleep(ui.sleep)
+    # sleep until the next poll or redraw is due, waking early on input
+    timeout = min(last_poll + ui.sleep, last_redraw + ui.redraw) - time.time()
+    if timeout < 0:
+      timeout = 0
+    select.select([sys.stdin], [], [], timeout)
+    # always drain input: KEY_RESIZE comes from SIGWINCH inside ncurses,
+    # not from stdin bytes, so select() never reports it (and retries
+    # after the signal); getch is non-blocking, so an empty drain is
+    # just one failed read
+    if dispatcher():
+      # repaint right away so keystroke feedback (axis markers, listing
+      # scroll, tab switches) doesn't wait for the redraw cadence; the
+      # tab fingerprints keep a no-change repaint cheap
+      last_redraw = time.time()
+      cls()
 
   # End of main
   ################################
@@ -234,220 +302,195 @@ def main():
 #################################
 #
 
+## dispatcher helpers; each key's work lives in a small function so the
+## jump tables below can map key -> handler directly
+
+# common preamble for keyboard jogging of one axis
+def _jog_axis(axis, f):
+  global ui
+  if ui.stat.queue==0 and ui.stat.interp_state == _INTERP_IDLE:
+    ui.axis = axis
+    ui.joint = axis
+    ui.jogging = True
+    ui.hal.jog_active(True)
+    ui.hal.set_axis(axis)
+    cmds.step_jog(ui, f)
+
+# arrow keys only jog on the default tab
+def _jog_xy(axis, f):
+  global ui
+  if ui.tab == 0:
+    _jog_axis(axis, f)
+
+# toggle the selected axis/joint
+def _select_axis(n):
+  global ui
+  if ui.axis == n or ui.joint == n:
+    ui.axis = None
+    ui.joint = None
+  else:
+    ui.axis = n
+    ui.joint = n
+  cmds.joint(ui)
+
+# cache everything derived from the screen size; only resize (and
+# startup) ever call this, so the tab functions just read attributes
+def _recompute_layout():
+  global ui
+  ui.listing_width = ui.maxx - 7 # listing text after the line number
+  ui.file_trunc = -(ui.maxx - 34) # filename slice on the program tab
+  ui.cmd_width = ui.maxx - 19 # executing command after line numbers
+  ui.last_tab_fp = None
+  ui.row_cache.clear()
+  ui.listing_cache.clear() # cached rows are formatted to the old width
+  ui.axis_line_cache = [None]*5
+
+def _resize(): # window resized; reset sizes & redraw
+  global ui
+  (ui.maxy, ui.maxx) = ui.s.getmaxyx()
+  _recompute_layout()
+
+def _redraw(): # force a full refresh
+  global ui
+  ui.last_tab_fp = None
+  ui.row_cache.clear()
+  # clear() already marks the whole window for repaint on the next
+  # refresh; redrawwin() on top of it just redid the same work
+  ui.s.clear()
+  cls()
+
+def _clear_messages(): # clear messages, redraw
+  global ui
+  ui.dispcount = 0
+  ui.olderr = (None, "")
+  _redraw()
+
+def _page_down(): # scroll program or tool list, else jog Z-
+  global ui
+  if ui.tab == 1: # scroll program
+    ui.program_start += 23
+    if ui.program_start > len(ui.listing):
+      ui.program_start = len(ui.listing)
+  elif ui.tab == 3: # scroll tool list
+    ui.tool_start += 60
+    if ui.tool_start > len(ui.tools)-1:
+      ui.tool_start = len(ui.tools)-1
+  else:
+    _jog_axis(2, -1.)
+
+def _page_up(): # scroll program or tool list, else jog Z+
+  global ui
+  if ui.tab == 1: # scroll program
+    ui.program_start -= 23
+    if ui.program_start < 0:
+      ui.program_start = 0
+  elif ui.tab == 3: # scroll tool list
+    ui.tool_start -= 60
+    if ui.tool_start < 0:
+      ui.tool_start = 0
+  else:
+    _jog_axis(2, 1.)
+
+def _reload_tools(): # reload tool table
+  global ui
+  ui.display_msg("Reload tool table, find all entries....")
+  cls()
+  cmds.load_tool_table(ui)
+  parse_tools()
+  ui.display_msg("Done.")
+  cls()
+
+def _quit():
+  sys.exit(1) # note that this raises a SystemExit exception
+
+# uppercase map for key bytes; one index instead of chr().upper() calls
+_UPPER = [chr(i).upper() for i in range(256)]
+
+## jump tables: O(1) lookup instead of walking a ~50-branch elif chain
+## per keystroke.  functions defined later in the file are wrapped in
+## lambdas so the name is resolved at call time.
+_KEY_HANDLERS = {
+  curses.KEY_RESIZE: _resize,
+  curses.ascii.ESC: lambda: cmds.abort(ui), # abort
+  curses.ascii.BS: lambda: cmds.abort(ui), # abort
+  curses.ascii.TAB: lambda: next_screen(), # tab to next display tab
+  curses.ascii.LF: _clear_messages,
+  curses.KEY_UP: lambda: _jog_xy(1, 1.), # jog Y+
+  curses.KEY_DOWN: lambda: _jog_xy(1, -1.), # jog Y-
+  curses.KEY_LEFT: lambda: _jog_xy(0, -1.), # jog X-
+  curses.KEY_RIGHT: lambda: _jog_xy(0, 1.), # jog X+
+  curses.KEY_NPAGE: _page_down,
+  curses.KEY_PPAGE: _page_up,
+  curses.KEY_HOME: lambda: cmds.home_axis(ui), # home selected axis
+  curses.KEY_END: lambda: cmds.home_all(ui), # home all
+}
+
+_CHAR_HANDLERS = {
+  'A': lambda: _select_axis(3), # select A axis
+  'B': lambda: cmds.block_delete(ui), # block delete toggle
+  'C': lambda: cmds.automatic(ui), # automatic mode
+  'D': lambda: cmds.mdi_mode(ui), # MDI mode
+  'E': lambda: cmds.estop_reset(ui), # toggle E Stop status
+  'F': lambda: cmds.flood(ui), # toggle flood coolant
+  'G': lambda: cmds.spindle(ui, 0), # spindle stop
+  'H': lambda: cmds.opt_stop(ui), # toggle optional stop
+  'I': lambda: cmds.mist(ui), # toggle mist coolant
+  'J': lambda: prev_screen(), # last screen
+  'K': lambda: next_screen(), # next screen
+  'L': _reload_tools,
+  'M': lambda: cmds.manual(ui), # Manual mode
+  'N': lambda: set_coord_offset(), # set coordinate offset
+  'O': lambda: open_program(), # Open program file, via dialog
+  'P': lambda: cmds.pause(ui), # pause executing program
+  'Q': _quit, # quit the whole thing
+  'R': lambda: cmds.run(ui), # run currently loaded program file
+  'S': lambda: cmds.reset(ui), # reset interpreter
+  'T': lambda: cmds.machine(ui), # toggle machine on
+  'U': lambda: cycle_jog_steps(), # cycle through jog steps
+  'V': lambda: cmds.spindle(ui, -1), # spindle reverse
+  'W': lambda: cmds.spindle(ui, 1), # spindle forward
+  'X': lambda: _select_axis(0), # select axis X
+  'Y': lambda: _select_axis(1), # select axis Y
+  'Z': lambda: _select_axis(2), # select axis Z
+  '\'': lambda: mdi_input(), # MDI command via dialog box
+  '|': _redraw, # force a refresh
+  '\x0c': _redraw, # ^L, force a refresh
+  '\\': lambda: cmds.override_lims(ui), # override limits toggle
+  '\x1c': lambda: cmds.override_lims(ui), # ^\, override limits toggle
+  '^': lambda: cmds.home_axis(ui), # home selected axis
+  '*': lambda: cmds.home_all(ui), # home all
+  '=': lambda: cmds.spindle_plus(ui), # spindle increase
+  '+': lambda: cmds.spindle_plus(ui), # spindle increase
+  '-': lambda: cmds.spindle_minus(ui), # spindle decrease
+}
+# digits set the feed rate: 1-9 -> 10%-90%, 0 -> 100%
+for _d in "0123456789":
+  _CHAR_HANDLERS[_d] = (lambda r: lambda: cmds.feedrate(ui, r))((int(_d) or 10)*10)
+del _d
+
+def _dispatch_one(cmd):
+  global ui
+
+  handler = _KEY_HANDLERS.get(cmd)
+  if handler is None: # normal ASCII; test as a single uppercase char
+    handler = _CHAR_HANDLERS.get(_UPPER[cmd & 0xFF])
+  if handler is not None:
+    handler()
+
 def dispatcher():
   global ui
 
-  cmd = ui.s.getch() # grab character(s), check for control characters
-  if cmd == curses.KEY_RESIZE:	# window resized; reset subwins & redraw
-    (ui.maxy, ui.maxx) = ui.s.getmaxyx()
-  elif cmd == curses.ascii.ESC or cmd == curses.ascii.BS: # abort
-    cmds.abort(ui.cmd)
-  elif cmd == curses.ascii.TAB: # tab to next display tab
-    next_screen()
-  elif cmd == curses.ascii.LF: # clear messages, redraw
-    ui.dispcount = 0
-    ui.olderr = (None, "")
-    ui.s.clear()
-    ui.s.redrawwin()
-    cls()
-  elif cmd == curses.KEY_UP: # jog Y+
-    if ui.tab == 0 and ui.stat.queue==0 and ui.stat.interp_state == linuxcnc.INTERP_IDLE:
-      ui.axis = 1
-      ui.joint = 1
-      ui.jogging = True
-      ui.hal.jog_active(True)
-      ui.hal.set_axis(ui.axis)
-      cmds.step_jog(ui, 1.)
-  elif cmd == curses.KEY_DOWN: # jog Y-
-    if ui.tab == 0 and ui.stat.queue==0 and ui.stat.interp_state == linuxcnc.INTERP_IDLE:
-      ui.axis = 1
-      ui.joint = 1
-      ui.jogging = True
-      ui.hal.jog_active(True)
-      ui.hal.set_axis(ui.axis)
-      cmds.step_jog(ui, -1.)
-  elif cmd == curses.KEY_LEFT: # jog X-
-    if ui.tab == 0 and ui.stat.queue==0 and ui.stat.interp_state == linuxcnc.INTERP_IDLE:
-      ui.axis = 0
-      ui.joint = 0
-      ui.jogging = True
-      ui.hal.jog_active(True)
-      ui.hal.set_axis(ui.axis)
-      cmds.step_jog(ui, -1.)
-  elif cmd == curses.KEY_RIGHT: # jog X+
-    if ui.tab == 0 and ui.stat.queue==0 and ui.stat.interp_state == linuxcnc.INTERP_IDLE:
-      ui.axis = 0
-      ui.joint = 0
-      ui.jogging = True
-      ui.hal.jog_active(True)
-      ui.hal.set_axis(ui.axis)
-      cmds.step_jog(ui, 1.)
-  elif cmd == curses.KEY_NPAGE: # page down - jog Z or next screen
-    if ui.tab == 1: # scroll program
-      ui.program_start += 23
-      if ui.program_start > len(ui.listing):
-        ui.program_start = len(ui.listing)
-    elif ui.tab == 3: # scroll tool list
-      ui.tool_start += 60
-      if ui.tool_start > len(ui.tools)-1:
-        ui.tool_start = len(ui.tools)-1
-    else:
-      if ui.stat.queue==0 and ui.stat.interp_state == linuxcnc.INTERP_IDLE:
-        ui.axis = 2
-        ui.joint = 2
-        ui.jogging = True
-        ui.hal.jog_active(True)
-        ui.hal.set_axis(ui.axis)
-        cmds.step_jog(ui, -1.)
-  elif cmd == curses.KEY_PPAGE: # page up - jog Z or previous screen
-    if ui.tab == 1: # scroll program
-      ui.program_start -= 23
-      if ui.program_start < 0:
-        ui.program_start = 0
-    elif ui.tab == 3: # scroll tool list
-      ui.tool_start -= 60
-      if ui.tool_start < 0:
-        ui.tool_start = 0
-    else:
-      if ui.stat.queue==0 and ui.stat.interp_state == linuxcnc.INTERP_IDLE:
-        ui.axis = 2
-        ui.joint = 2
-        ui.jogging = True
-        ui.hal.jog_active(True)
-        ui.hal.set_axis(ui.axis)
-        cmds.step_jog(ui, 1.)
-  #elif cmd == curses.KEY_HOME: 
-  #elif cmd == curses.KEY_END:
-  #elif cmd == curses.KEY_F1: # all motion max velocity override?
-  #elif cmd == curses.KEY_F2:
-  #elif cmd == curses.KEY_F3:
-  #elif cmd == curses.KEY_F4:
-  #elif cmd == curses.KEY_F5:
-  #elif cmd == curses.KEY_F6:
-  #elif cmd == curses.KEY_F7:
-  #elif cmd == curses.KEY_F8:
-  #elif cmd == curses.KEY_F9:
-  #elif cmd == curses.KEY_F10:
-  else: # normal ASCII, handle below
-    cmd = string.upper(chr(cmd & 0xFF))	# convert to single uppercase char for testing
-    if cmd == 'A': # select A axis
-      if ui.axis == 3 or ui.joint == 3:
-        ui.axis = None
-	ui.joint = None
-      else:
-	ui.axis = 3
-	ui.joint = 3 # 4th axis active
-      cmds.joint(ui)
-    elif cmd == 'B': # block delete toggle
-      cmds.block_delete(ui)
-    elif cmd == 'C': # automatic mode
-      cmds.automatic(ui)
-    elif cmd == 'D': # MDI mode
-      cmds.mdi_mode(ui)
-    elif cmd == 'E': # toggle E Stop status
-      cmds.estop_reset(ui)
-    elif cmd == 'F': # toggle flood coolant
-      cmds.flood(ui)
-    elif cmd == 'G': # spindle stop
-      cmds.spindle(ui, 0)
-    elif cmd == 'H': # toggle optional stop
-      cmds.opt_stop(ui)
-    elif cmd == 'I': # toggle mist coolant
-      cmds.mist(ui)
-    elif cmd == 'J': # last screen
-      prev_screen();
-    elif cmd == 'K': # next screen
-      next_screen()
-    elif cmd == 'L': # reload tool table
-      ui.display_msg("Reload tool table, find all entries....")
-      cls()
-      cmds.load_tool_table(ui)
-      parse_tools()
-      ui.display_msg("Done.")
-      cls()
-    elif cmd == 'M': # Manual mode
-      cmds.manual(ui)
-    elif cmd == 'N': # set coordinate offset
-      set_coord_offset()
-    elif cmd == 'O': # Open program file, via dialog
-      open_program()
-    elif cmd == 'P': # pause executing program
-      cmds.pause(ui)
-    elif cmd == 'Q': # quit the whole thing
-      sys.exit(1) # note that this raises a SystemExit exception
-    elif cmd == 'R': # run currently loaded program file
-      cmds.run(ui)
-    elif cmd == 'S': # reset interpreter
-      cmds.reset(ui)
-    elif cmd == 'T': # toggle machine on
-      cmds.machine(ui)
-    elif cmd == 'U': # cycle through jog steps
-      cycle_jog_steps()
-    elif cmd == 'V': # spindle reverse
-      cmds.spindle(ui, -1)
-    elif cmd == 'W': # spindle forward
-      cmds.spindle(ui, 1)
-    elif cmd == 'X': # select axis X
-      if ui.axis == 0 or ui.joint == 0:
-        ui.axis = None
-	ui.joint = None
-      else:
-	ui.axis = 0
-	ui.joint = 0
-      cmds.joint(ui)
-    elif cmd == 'Y': # select axis Y
-      if ui.axis == 1 or ui.joint == 1:
-        ui.axis = None
-	ui.joint = None
-      else:
-	ui.axis = 1
-	ui.joint = 1
-      cmds.joint(ui)
-    elif cmd == 'Z': # select axis Z
-      if ui.axis == 2 or ui.joint == 2:
-        ui.axis = None
-	ui.joint = None
-      else:
-	ui.axis = 2
-	ui.joint = 2
-      cmds.joint(ui)
-    elif cmd == '\'': # MDI command via dialog box
-      mdi_input()
-    elif cmd == '|' or cmd == '': # force a refresh
-      ui.s.clear()
-      ui.s.redrawwin()
-      cls()
-    elif cmd == '\\' or cmd == '': # override limits toggle
-      cmds.override_lims(ui)
-    elif cmd == '^' or cmd == curses.KEY_HOME: # home selected axis
-      cmds.home_axis(ui)
-    elif cmd == '*' or cmd == curses.KEY_END: # home all
-      cmds.home_all(ui)
-    elif cmd == '0': # Feed rate to 100%
-      cmds.feedrate(ui, 100)
-    elif cmd == '1': # Feed rate to 10%
-      cmds.feedrate(ui, 10)
-    elif cmd == '2': # Feed rate to 20%
-      cmds.feedrate(ui, 20)
-    elif cmd == '3': # Feed rate to 30%
-      cmds.feedrate(ui, 30)
-    elif cmd == '4': # Feed rate to 40%
-      cmds.feedrate(ui, 40)
-    elif cmd == '5': # Feed rate to 50%
-      cmds.feedrate(ui, 50)
-    elif cmd == '6': # Feed rate to 60%
-      cmds.feedrate(ui, 60)
-    elif cmd == '7': # Feed rate to 70%
-      cmds.feedrate(ui, 70)
-    elif cmd == '8': # Feed rate to 80%
-      cmds.feedrate(ui, 80)
-    elif cmd == '9': # Feed rate to 90%
-      cmds.feedrate(ui, 90)
-    elif cmd == '=' or cmd == '+': # spindle increase
-      cmds.spindle_plus(ui)
-    elif cmd == '-': # spindle decrease
-      cmds.spindle_minus(ui)
-  return
+  # drain every queued keystroke before returning, so held keys and
+  # pasted input don't lag one event per display tick; report whether
+  # anything was handled so the caller knows to repaint
+  handled = False
+  while True:
+    cmd = ui.s.getch()
+    if cmd == -1: # no more input
+      break
+    _dispatch_one(cmd)
+    handled = True
+  return handled
 
 
 
@@ -468,38 +511,55 @@ def cycle_jog_steps():
 # Redraw the whole screen
 def cls():
   global ui
-
-  ui.s.erase()
-  ui.stat.poll() # update linuxcnc status
+  # note: no stat.poll() here; the main loop polls on its own cadence
+  # and a second poll per frame just doubled the NML round-trips
 
   # screen tabs, reverse video for active tab
-  offset = 0;
   for i in range(len(ui.tabs)):
     if i == ui.tab:
-      ui.s.addstr(0,offset, ui.tabs[i], curses.A_REVERSE)
+      put(0,ui.tab_offsets[i], ui.tabs[i], curses.A_REVERSE)
     else:
-      ui.s.addstr(0,offset, ui.tabs[i])
-    offset = offset + int(80/len(ui.tabs))
+      put(0,ui.tab_offsets[i], ui.tabs[i])
 
-  # update coordinates for computing velocity, even if not on default tab
+  # update coordinates for computing velocity, even if not on default tab;
+  # skip tiny intervals (back-to-back repaints would divide by ~0) and
+  # smooth with an EMA so display jitter in the poll period averages out
   now = time.time()
   dt = now - ui.time; # difference in s since last update
-  ui.time = now
-  for i in range(ui.n_axes):
-    ui.v[i] = (ui.stat.position[i] - ui.old[i])/dt
-    ui.old[i] = ui.stat.position[i]
-
-  # draw rest of screen based on current tab
-  if ui.tab == 0:
-    default_tab()
-  elif ui.tab == 1:
-    g_code_tab()
+  if dt >= 0.05:
+    ui.time = now
+    pos = ui.stat.position
+    old = ui.old
+    v = ui.v
+    for i in range(ui.n_axes):
+      p = pos[i]
+      v[i] = 0.7*v[i] + 0.3*(p - old[i])/dt
+      old[i] = p
+
+  # draw rest of screen based on current tab; skip the whole tab body
+  # when its fingerprint -- everything it would display -- is unchanged
+  # from the last frame.  On an idle machine this drops per-cycle work
+  # to the tab header and error line.
+  if ui.tab == 1:
+    fp = (1, g_code_fingerprint())
   elif ui.tab == 2:
-    status_tab()
+    # live pin readout has no cheap fingerprint; repaint every frame
+    # and let put() diff the rows (free when get_value is unavailable)
+    fp = (2, now)
   elif ui.tab == 3:
-    tool_tab()
+    fp = (3, tool_fingerprint())
   else:
-    default_tab()
+    fp = (0, default_fingerprint())
+  if fp != ui.last_tab_fp:
+    ui.last_tab_fp = fp
+    if ui.tab == 1:
+      g_code_tab()
+    elif ui.tab == 2:
+      status_tab()
+    elif ui.tab == 3:
+      tool_tab()
+    else:
+      default_tab()
 
   # line 23 - errors, messages from NML queue
   # check for messages back from linuxcnc, like errors or messages from
@@ -508,20 +568,90 @@ def cls():
   if error:
     ui.olderr = error; ui.dispcount = 0
   kind, text = ui.olderr
-  if kind in (linuxcnc.NML_ERROR, linuxcnc.OPERATOR_ERROR):
-    ui.s.addstr(23,0,"%s"%text[0:75], curses.A_REVERSE) # errors in reverse video
+  if kind in (_NML_ERROR, _OPERATOR_ERROR):
+    put(23,0,"%s"%text[0:75], curses.A_REVERSE) # errors in reverse video
   else:
-    ui.s.addstr(23,0,"%s"%text[0:75])
+    put(23,0,"%s"%text[0:75])
   ui.dispcount = ui.dispcount+1
   if ui.dispcount > 100: # clear old errors after 100 refresh cycles
     ui.dispcount = 0
     ui.olderr = (None, "")
-  # done with default screen draw
-  ui.s.refresh()
+  # done with default screen draw; mark changes and let curses send one
+  # optimized burst to the terminal
+  ui.s.noutrefresh()
+  curses.doupdate()
+
+# draw text at (y,x), skipping the curses call when the cell run is
+# unchanged from the previous frame; shorter text is space-padded to
+# cover what it replaces.  This is what keeps traffic to a serial
+# terminal down, since cls() no longer erases the whole screen.
+def put(y, x, text, attr=0):
+  global ui
+  key = (y, x)
+  old = ui.row_cache.get(key)
+  if old is not None and len(old[0]) > len(text):
+    text = text + " "*(len(old[0])-len(text))
+  if old == (text, attr):
+    return
+  ui.row_cache[key] = (text, attr)
+  ui.s.addstr(y, x, text, attr)
 
 ####
 ## Screen drawing functions
 #
+## memoized formatting of active G/M codes; the set of distinct codes is
+## tiny, so after warmup each frame is dict lookups instead of %-formats
+_GCODE_STR = {}
+_MCODE_STR = {}
+
+def gcode_str(i):
+  s = _GCODE_STR.get(i)
+  if s is None:
+    if i % 10 == 0:
+      s = "G%d " % (i//10)
+    else:
+      s = "G%d.%d " % (i//10, i%10)
+    _GCODE_STR[i] = s
+  return s
+
+def mcode_str(i):
+  s = _MCODE_STR.get(i)
+  if s is None:
+    s = "M%d " % i
+    _MCODE_STR[i] = s
+  return s
+
+## fingerprints: a tuple of everything a tab body reads, used by cls()
+## to skip re-rendering a tab whose inputs did not change
+def default_fingerprint():
+  global ui
+  s = ui.stat
+  n = ui.n_axes
+  return (ui.g20, tuple(s.actual_position[:n]), tuple(s.dtg[:n]),
+    tuple(s.tool_offset[:n]), tuple(s.g5x_offset), tuple(s.g92_offset),
+    s.rotation_xy, s.g5x_index, tuple(ui.v[:n]),
+    tuple((s.joint[i]["enabled"], s.joint[i]["homed"]) for i in range(n)),
+    ui.axis, ui.jogging, ui.jog_step, ui.limits_override,
+    s.feedrate, s.feed_override_enabled,
+    s.spindle[0]["override"], s.spindle[0]["override_enabled"],
+    s.spindle[0]["direction"], s.spindle[0]["speed"],
+    s.max_velocity, s.estop, s.task_state, s.task_mode,
+    s.feed_hold_enabled, s.motion_mode, s.delay_left,
+    s.optional_stop, s.block_delete, s.mist, s.flood,
+    tuple(s.gcodes), tuple(s.mcodes), s.settings[1],
+    s.tool_in_spindle, s.pocket_prepped,
+    s.tool_table[0].zoffset, s.tool_table[0].diameter, ui.tool_serial,
+    s.file, s.command, s.motion_line, s.current_line)
+
+def g_code_fingerprint():
+  global ui
+  return (ui.stat.file, ui.stat.current_line, ui.program_start,
+    len(ui.listing) if ui.listing else 0, ui.maxx)
+
+def tool_fingerprint():
+  global ui
+  return (ui.tool_start, ui.tool_serial, len(ui.tools), ui.maxx)
+
 ## Default tab - most info for actually running
 def default_tab():
   global ui
@@ -541,80 +671,94 @@ def default_tab():
 
   # lines 2 to 6, units, axis positions, overrides, jog step, states
   if ui.g20:
-    ui.s.addstr(1,9, "units are inches")
+    put(1,9, "units are inches")
   else:
-    ui.s.addstr(1,9, "units are mm")
+    put(1,9, "units are mm")
   # create relative units from machine units; not stored in ui.stat, so compute
-  # each update!
-  positions = [(i-j) for i, j in zip(ui.stat.actual_position, ui.stat.tool_offset)]
-  positions = [(i-j) for i, j in zip(positions, ui.stat.g5x_offset)]
+  # each update!  single pass instead of three zipped list builds
+  abs_pos = ui.stat.actual_position
+  tool = ui.stat.tool_offset
+  g5x = ui.stat.g5x_offset
+  g92 = ui.stat.g92_offset
+  positions = [abs_pos[i] - tool[i] - g5x[i] for i in range(ui.n_axes)]
   if ui.stat.rotation_xy != 0: # rotate coords around Z
     t = math.radians(-ui.stat.rotation_xy)
+    ct = math.cos(t); st = math.sin(t)
     x = positions[0]; y = positions[1];
-    positions[0] = x*math.cos(t) - y*math.sin(t)
-    positions[1] = x*math.sin(t) + y*math.cos(t)
-  positions = [(i-j) for i, j in zip(positions, ui.stat.g92_offset)]
-  ui.s.addstr(1,30, "E - Enabled, H - Homed, A - Active Jog")
-  ui.s.addstr(2,0, "Relative     Absolute     DTG    EHA   Velocity")
+    positions[0] = x*ct - y*st
+    positions[1] = x*st + y*ct
+  for i in range(ui.n_axes):
+    positions[i] -= g92[i]
+  put(1,30, "E - Enabled, H - Homed, A - Active Jog")
+  put(2,0, "Relative     Absolute     DTG    EHA   Velocity")
+  v_scale = ucf*60.0
   for i in range(ui.n_axes):
     e = "*" if ui.stat.joint[i]["enabled"] else " "
     h = "*" if ui.stat.joint[i]["homed"] else " "
     f = "*" if ui.axis == i else " "
-    ui.s.addstr(3+i,0, "%s%+9.4f  %+9.4f  %+9.4f %s%s%s %+9.4f"% \
-      (ui.axis_ltrs[i], positions[i]*ucf, ui.stat.actual_position[i]*ucf, ui.stat.dtg[i]*ucf, e, h, f, ui.v[i]*ucf*60.0))
+    row = (ui.axis_ltrs[i], positions[i]*ucf, ui.stat.actual_position[i]*ucf, ui.stat.dtg[i]*ucf, e, h, f, ui.v[i]*v_scale)
+    # re-format the row only when its inputs changed; a still axis
+    # reuses last frame's string and put() then skips the addstr too
+    cached = ui.axis_line_cache[i]
+    if cached is not None and cached[0] == row:
+      line = cached[1]
+    else:
+      line = "%s%+9.4f  %+9.4f  %+9.4f %s%s%s %+9.4f" % row
+      ui.axis_line_cache[i] = (row, line)
+    put(3+i,0, line)
 
   # overrides, states, jog step, etc.
   e = "*" if ui.stat.feed_override_enabled else " "
-  ui.s.addstr(2,53,"Feed    %3d%% %s"%(int(ui.stat.feedrate*100), e))
+  put(2,53,"Feed    %3d%% %s"%(int(ui.stat.feedrate*100), e))
   e = "*" if ui.stat.spindle[0]["override_enabled"] else " "
-  ui.s.addstr(3,53,"Spindle %3d%% %s"%(int(ui.stat.spindle[0]["override"]*100), e))
+  put(3,53,"Spindle %3d%% %s"%(int(ui.stat.spindle[0]["override"]*100), e))
   max_v = ui.stat.max_velocity
   if max_v > 1000:
-    ui.s.addstr(4,53,"Max Vel ******") # indicate max velocity not set
+    put(4,53,"Max Vel ******") # indicate max velocity not set
   else:
-    ui.s.addstr(4,53,"Max Vel %6.2f"%(max_v*60.0)) # unit/sec to unit/min
+    put(4,53,"Max Vel %6.2f"%(max_v*60.0)) # unit/sec to unit/min
   # jogging step size, * if on
   jog_on = "*" if ui.jogging else " "
-  ui.s.addstr(5,53,"Jog Step %6.4f %s"%(ui.jog_step, jog_on))
+  put(5,53,"Jog Step %6.4f %s"%(ui.jog_step, jog_on))
   # machine status, operating mode
   estop = "E-STOP" if ui.stat.estop else "ENABLE"
-  machine = "ON " if ui.stat.task_state == linuxcnc.STATE_ON else "OFF"
-  if ui.stat.task_mode == linuxcnc.MODE_MDI:
+  machine = "ON " if ui.stat.task_state == _STATE_ON else "OFF"
+  if ui.stat.task_mode == _MODE_MDI:
     mode = " MDI  "
-  elif ui.stat.task_mode == linuxcnc.MODE_AUTO:
+  elif ui.stat.task_mode == _MODE_AUTO:
     mode = " AUTO "
-  elif ui.stat.task_mode == linuxcnc.MODE_MANUAL:
+  elif ui.stat.task_mode == _MODE_MANUAL:
     mode = "MANUAL"
   else:
     mode = "UNKNWN"
   hold = "HOLD" if ui.stat.feed_hold_enabled else " RUN"
-  ui.s.addstr(6,48,"%s | %s | %s | %s"%(estop, machine, mode, hold))
+  put(6,48,"%s | %s | %s | %s"%(estop, machine, mode, hold))
 
   # line 7 - motion mode, delay timer
-  if ui.stat.motion_mode == linuxcnc.TRAJ_MODE_COORD:
+  if ui.stat.motion_mode == _TRAJ_MODE_COORD:
     traj = " coord"
-  elif ui.stat.motion_mode == linuxcnc.TRAJ_MODE_FREE:
+  elif ui.stat.motion_mode == _TRAJ_MODE_FREE:
     traj = " joint"
-  elif ui.stat.motion_mode == linuxcnc.TRAJ_MODE_TELEOP:
+  elif ui.stat.motion_mode == _TRAJ_MODE_TELEOP:
     traj = "teleop"
   else:
     traj = "unknwn"
-  ui.s.addstr(7,50,"Motion mode %s"%traj)
+  # one put for cols 40+; the delay and motion-mode fields overlap, and
+  # put()'s cell-run diffing assumes non-overlapping runs
   if ui.stat.delay_left > 0:
-    ui.s.addstr(7,40, "Delaying; %6.3f secs left")
+    put(7,40, "Delaying; %6.3f secs left"%ui.stat.delay_left)
+  else:
+    put(7,40, "          Motion mode %s"%traj)
 
   # line 8,9 - Current coord system, offsets, G92 offsets, Opt Stop, Block Delete
   optstop = "*" if ui.stat.optional_stop else " "
   blockdel = "*" if ui.stat.block_delete else " "
-  ui.s.addstr(8,66, "Opt Stop %s"%optstop)
-  ui.s.addstr(9,66, "Blk Del  %s"%blockdel)
+  put(8,66, "Opt Stop %s"%optstop)
+  put(9,66, "Blk Del  %s"%blockdel)
 
-  if ui.stat.g5x_index > 5:
-    cs = "G59.%1d"%(ui.stat.g5x_index-6)
-  else:
-    cs = "G5%1d"%(3+ui.stat.g5x_index)
-  ui.s.addstr(8,0, "%s X% 9.4f Y% 9.4f Z% 9.4f A% 9.4f R%+10.5f"%(cs, ui.stat.g5x_offset[0], ui.stat.g5x_offset[1], ui.stat.g5x_offset[2], ui.stat.g5x_offset[3], ui.stat.rotation_xy))
-  ui.s.addstr(9,0, "G92 X% 9.4f Y% 9.4f Z% 9.4f A% 9.4f"%(ui.stat.g92_offset[0], ui.stat.g92_offset[1], ui.stat.g92_offset[2], ui.stat.g92_offset[3]))
+  cs = ui.cs_map[ui.stat.g5x_index-1]
+  put(8,0, "%s X% 9.4f Y% 9.4f Z% 9.4f A% 9.4f R%+10.5f"%(cs, ui.stat.g5x_offset[0], ui.stat.g5x_offset[1], ui.stat.g5x_offset[2], ui.stat.g5x_offset[3], ui.stat.rotation_xy))
+  put(9,0, "G92 X% 9.4f Y% 9.4f Z% 9.4f A% 9.4f"%(ui.stat.g92_offset[0], ui.stat.g92_offset[1], ui.stat.g92_offset[2], ui.stat.g92_offset[3]))
 
   # line 10 - blank
 
@@ -622,35 +766,26 @@ def default_tab():
   spindle = "OFF"
   if ui.stat.spindle[0]["direction"] == 1: spindle = "FWD"
   if ui.stat.spindle[0]["direction"] == -1: spindle = "REV"
-  flood = " ON" if ui.stat.flood == linuxcnc.FLOOD_ON else "OFF"
-  mist = " ON" if ui.stat.mist == linuxcnc.MIST_ON else "OFF"
-  ui.s.addstr(11,0,"S%5d  F%9.4f  Spindle %s  Flood %s  Mist %s"%\
+  flood = " ON" if ui.stat.flood == _FLOOD_ON else "OFF"
+  mist = " ON" if ui.stat.mist == _MIST_ON else "OFF"
+  put(11,0,"S%5d  F%9.4f  Spindle %s  Flood %s  Mist %s"%\
     (int(ui.stat.spindle[0]["speed"]), ui.stat.settings[1], \
      spindle, flood, mist))
 
   # line 12 - blank
 
   # line 13 - M codes
-  mcodes = ""
-  for i in ui.stat.mcodes[1:]:
-    if i == -1: continue
-    mcodes += "M%d " % i
-  ui.s.addstr(13,0, mcodes)
+  mcodes = "".join(mcode_str(i) for i in ui.stat.mcodes[1:] if i != -1)
+  put(13,0, mcodes)
 
   # line 14 - G codes
-  gcodes = ""
-  for i in ui.stat.gcodes[1:]:
-    if i == -1: continue
-    if i % 10 == 0:
-	    gcodes += "G%d " % (i/10)
-    else:
-	    gcodes += "G%d.%d " % (i/10, i%10)
-  ui.s.addstr(14,0, gcodes)
+  gcodes = "".join(gcode_str(i) for i in ui.stat.gcodes[1:] if i != -1)
+  put(14,0, gcodes)
 
   # line 15  - blank
 
   # line 16 - tool in spndle, tool prepped for change, current tool z, dia
-  ui.s.addstr(16,0,"Tool in spindle %3d     next %3d     z offset %8.4f diameter %8.6f"%\
+  put(16,0,"Tool in spindle %3d     next %3d     z offset %8.4f diameter %8.6f"%\
     (ui.stat.tool_in_spindle, ui.stat.pocket_prepped, ui.stat.tool_table[0].zoffset, \
      ui.stat.tool_table[0].diameter))
 
@@ -658,25 +793,27 @@ def default_tab():
 
   # line 18 - current program filename
   if ui.stat.file:
-    ui.s.addstr(18,0,"%s"%(ui.stat.file))
+    put(18,0,"%s"%(ui.stat.file))
   else:
-    ui.s.addstr(18,0,"No progam file loaded...")
+    put(18,0,"No progam file loaded...")
 
   # line 19 - currently executing command
   if ui.stat.command:
-    if len(ui.stat.command) > ui.maxx-19:
-      cmd = ui.stat.command[0:ui.maxx-19]
+    if len(ui.stat.command) > ui.cmd_width:
+      cmd = ui.stat.command[0:ui.cmd_width]
     else:
       cmd = ui.stat.command
   else:
     cmd = "no current command"
-  ui.s.addstr(19,0,"M:%6d L:%6d %s"%(ui.stat.motion_line, ui.stat.current_line, cmd))
+  put(19,0,"M:%6d L:%6d %s"%(ui.stat.motion_line, ui.stat.current_line, cmd))
 
   # line 20 - blank
 
   # line 21 - Limit Override warning
   if ui.limits_override:
-    ui.s.addstr(21,0,"****LIMITS OVERRIDDEN****")
+    put(21,0,"****LIMITS OVERRIDDEN****")
+  else:
+    put(21,0,"")
 
   # line 22 - blank
   
@@ -689,214 +826,98 @@ def g_code_tab():
   # print the current program
   s = ui.program_start
   l = ui.stat.current_line
-  w = ui.maxx - 7
+  w = ui.listing_width
   if ui.listing:
     n = len(ui.listing)
     p = l/n*100
-    start = -1*(ui.maxx-34)
-    ui.s.addstr(1,0, "CURRENT FILE: %s  %d of %d lines (%%%3d)"%(ui.stat.file[start:-1], l, n, p))
+    start = ui.file_trunc
+    put(1,0, "CURRENT FILE: %s  %d of %d lines (%%%3d)"%(ui.stat.file[start:-1], l, n, p))
     # list from start offset to end of screen
     for i in range(2,23):
       n = s-2+i
       if n<0: n=0
-      if n>len(ui.listing)-1: break;
+      if n>len(ui.listing)-1:
+        put(i,0, "") # blank the rows past the end of the program
+        continue
+      key = (n, w)
+      line = ui.listing_cache.get(key)
+      if line is None:
+        if len(ui.listing_cache) > 2000: # bound the cache on huge programs
+          ui.listing_cache.clear()
+        line = "%6d %s"%(n+1, ui.listing[n][0:w])
+        ui.listing_cache[key] = line
       if n==l:
-        ui.s.addstr(i,0, "%6d %s"%(n+1, ui.listing[n][0:w]), curses.A_REVERSE)
+        put(i,0, line, curses.A_REVERSE)
       else:
-        ui.s.addstr(i,0, "%6d %s"%(n+1, ui.listing[n][0:w]))
+        put(i,0, line)
   else:
-    ui.s.addstr(1,0, "NO CURRENT FILE")
+    put(1,0, "NO CURRENT FILE")
+    for i in range(2,23):
+      put(i,0, "")
 
   # done with g code screen
 
 
 
 ## Status tab - lots of parameter info, hal pins
+# rows of the status tab as (row, format, pin names), built once at
+# import; a paint is then one hal.get_value sweep per row instead of
+# dozens of inline lookups
+_STATUS_ROWS = [
+  (1, "adapt-fd:%8.6f coord-err:%1d coord-mode:%1d teleop:%1d feed-hold:%1d feed-inhibit:%1d",
+    ("motion.adaptive-feed", "motion.coord-error", "motion.coord-mode",
+     "motion.teleop-mode", "motion.feed-hold", "motion.feed-inhibit")),
+  (2, "in-pos:%1d enabled:%1d soft-limit:%1d servo.period:%9u current-vel:%9.6f",
+    ("motion.in-position", "motion.motion-enabled", "motion.on-soft-limit",
+     "motion.servo.last-period", "motion.current-vel")),
+  (3, "probe:%1d spindle- on:%1d fwd:%1d rev:%1d at-speed:%1d brake:%1d",
+    ("motion.probe-input", "motion.spindle-on", "motion.spindle-forward",
+     "motion.spindle-reverse", "motion.spindle-at-speed", "motion.spindle-brake")),
+  (4, "digital in- 00:%1d 01:%1d 02:%1d 03:%1d   out- 00:%1d 01:%1d 02:%1d 03:%1d",
+    ("motion.digital-in-00", "motion.digital-in-01", "motion.digital-in-02",
+     "motion.digital-in-03", "motion.digital-out-00", "motion.digital-out-01",
+     "motion.digital-out-02", "motion.digital-out-03")),
+  (5, "analog  in- 00:%9.6f 01:%9.6f 02:%9.6f 03:%9.6f",
+    ("motion.analog-in-00", "motion.analog-in-01",
+     "motion.analog-in-02", "motion.analog-in-03")),
+  (6, "analog out- 00:%9.6f 01:%9.6f 02:%9.6f 03:%9.6f",
+    ("motion.analog-out-00", "motion.analog-out-01",
+     "motion.analog-out-02", "motion.analog-out-03")),
+]
+# four rows per axis, generated so every axis reads its own pins
+for _i, _ltr in enumerate("XYZA"):
+  _r = 8 + 4*_i
+  _STATUS_ROWS.append((_r,
+    _ltr+" active:%1d a-enable:%1d a-fault:%1d err:%1d flt:%1d h-sw:%1d homed:%1d homing:%1d in-pos:%1d",
+    tuple("axis.%d.%s"%(_i, p) for p in ("active", "amp-enable-out",
+      "amp-fault-in", "error", "faulted", "home-sw-in", "homed",
+      "homing", "in-position"))))
+  _STATUS_ROWS.append((_r+1,
+    _ltr+" jog- enable:%1d vel-mode:%1d kb-jog:%1d cnts:%9d scale:%9.6f pos:%9.6f",
+    tuple("axis.%d.%s"%(_i, p) for p in ("jog-enable", "jog-vel-mode",
+      "kb-jog-active", "jog-counts", "jog-scale", "jog-cmd-pos"))))
+  _STATUS_ROWS.append((_r+2,
+    _ltr+" backlash- corr:%9.6f filt:%9.6f vel:%9.6f",
+    tuple("axis.%d.%s"%(_i, p) for p in ("backlash-corr",
+      "backlash-filt", "backlash-vel"))))
+  _STATUS_ROWS.append((_r+3,
+    _ltr+" motor- pos:%9.6f fb:%9.6f limits hard -%1d/+%1d switch -%1d/+%1d wheel:%1d",
+    tuple("axis.%d.%s"%(_i, p) for p in ("motor-pos-cmd", "motor-pos-fb",
+      "neg-hard-limit", "pos-hard-limit", "neg-lim-sw-in",
+      "pos-lim-sw-in", "wheel-jog-active"))))
+del _i, _ltr, _r
+
 def status_tab():
   global ui
   # long listing of current status
-  # hal.get_value() currently not implemented in the halmodule of machinekit
-  # once that is fixed, can use all these lines for real-time readout of info.
-  # SIGH.
-#  ui.s.addstr(1,0, "adapt-fd:%8.6f coord-err:%1d coord-mode:%1d teleop:%1d feed-hold:%1d feed-inhibit:%1d"%(\
-#    hal.get_value("motion.adaptive-feed"), \
-#    hal.get_value("motion.coord-error"), \
-#    hal.get_value("motion.coord-mode"), \
-#    hal.get_value("motion.teleop-mode"), \
-#    hal.get_value("motion.feed-hold"), \
-#    hal.get_value("motion.feed-inhibit") \
-#    ))
-#  ui.s.addstr(2,0, "in-pos:%1d enabled:%1d soft-limit:%1d servo.period:%9u current-vel:%9.6f"%(\
-#    hal.get_value("motion.in-position"), \
-#    hal.get_value("motion.motion-enabled"), \
-#    hal.get_value("motion.on-soft-limit"), \
-#    hal.get_value("motion.servo.last-period"), \
-#    hal.get_value("motion.current-vel") \
-#    ))
-#  ui.s.addstr(3,0, "probe:%1d spindle- on:%1d fwd:%1d rev:%1d at-speed:%1d brake:%1d"%(\
-#    hal.get_value("motion.probe-input"), \
-#    hal.get_value("motion.spindle-on"), \
-#    hal.get_value("motion.spindle-forward"), \
-#    hal.get_value("motion.spindle-reverse"), \
-#    hal.get_value("motion.spindle-at-speed"), \
-#    hal.get_value("motion.spindle-brake") \
-#    ))
-#  ui.s.addstr(4,0, "digital in- 00:%1d 01:%1d 02:%1d 03:%1d   out- 00:%1d 01:%1d 02:%1d 03:%1d"%(\
-#    hal.get_value("motion.digital-in-00"), \
-#    hal.get_value("motion.digital-in-01"), \
-#    hal.get_value("motion.digital-in-02"), \
-#    hal.get_value("motion.digital-in-03"), \
-#    hal.get_value("motion.digital-out-00"), \
-#    hal.get_value("motion.digital-out-01"), \
-#    hal.get_value("motion.digital-out-02"), \
-#    hal.get_value("motion.digital-out-03") \
-#    ))
-#  ui.s.addstr(5,0, "analog  in- 00:%9.6f 01:%9.6f 02:%9.6f 03:%9.6f"%(\
-#    hal.get_value("motion.analog-in-00"), \
-#    hal.get_value("motion.analog-in-01"), \
-#    hal.get_value("motion.analog-in-02"), \
-#    hal.get_value("motion.analog-in-03") \
-#    ))
-#  ui.s.addstr(6,0, "analog out- 00:%9.6f 01:%9.6f 02:%9.6f 03:%9.6f"%(\
-#    hal.get_value("motion.analog-out-00"), \
-#    hal.get_value("motion.analog-out-01"), \
-#    hal.get_value("motion.analog-out-02"), \
-#    hal.get_value("motion.analog-out-03") \
-#    ))
-#  
-#  ui.s.addstr(8,0, "X active:%1d a-enable:%1d a-fault:%1d err:%1d flt:%1d h-sw:%1d homed:%1d homing:%1d in-pos:%1d"% (\
-#    hal.get_value("axis.0.active"), \
-#    hal.get_value("axis.0.amp-enable-out"), \
-#    hal.get_value("axis.0.amp-fault-in"), \
-#    hal.get_value("axis.0.error"), \
-#    hal.get_value("axis.0.faulted"), \
-#    hal.get_value("axis.0.home-sw-in"), \
-#    hal.get_value("axis.0.homed"), \
-#    hal.get_value("axis.0.homing"), \
-#    hal.get_value("axis.0.in-position") \
-#    ))
-#  ui.s.addstr(9,0, "X jog- enable:1 vel-mode:1 kb-jog:1 cnts:%9d scale:%9.6f pos:%9.6f"% (\
-#    hal.get_value("axis.0.jog-enable"), \
-#    hal.get_value("axis.0.jog-vel-mode"), \
-#    hal.get_value("axis.0.kb-jog-active"), \
-#    hal.get_value("axis.0.jog-counts"), \
-#    hal.get_value("axis.0.jog-scale"), \
-#    hal.get_value("axis.0.jog-cmd-pos") \
-#    ))
-#  ui.s.addstr(10,0, "X backlash- corr:%9.6f filt:%9.6f vel:%9.6f"% (\
-#    hal.get_value("axis.0.backlash-corr"), \
-#    hal.get_value("axis.0.backlash-filt"), \
-#    hal.get_value("axis.0.backlash-vel") \
-#    ))
-#  ui.s.addstr(11,0, "X motor- pos:%9.6f fb:%9.6f limits hard -%1d/+%1d switch -%1d/+%1d wheel:%1d"% (\
-#    hal.get_value("axis.0.motor-pos-cmd"), \
-#    hal.get_value("axis.0.motor-pos-fb"), \
-#    hal.get_value("axis.0.neg-hard-limit"), \
-#    hal.get_value("axis.0.pos-hard-limit"), \
-#    hal.get_value("axis.0.neg-lim-sw-in"), \
-#    hal.get_value("axis.0.pos-lim-sw-in"), \
-#    hal.get_value("axis.0.wheel-jog-active") \
-#    ))
-#  ui.s.addstr(12,0, "Y active:%1d a-enable:%1d a-fault:%1d err:%1d flt:%1d h-sw:%1d homed:%1d homing:%1d in-pos:%1d"% (\
-#    hal.get_value("axis.1.active"), \
-#    hal.get_value("axis.1.amp-enable-out"), \
-#    hal.get_value("axis.1.amp-fault-in"), \
-#    hal.get_value("axis.1.error"), \
-#    hal.get_value("axis.1.faulted"), \
-#    hal.get_value("axis.1.home-sw-in"), \
-#    hal.get_value("axis.1.homed"), \
-#    hal.get_value("axis.1.homing"), \
-#    hal.get_value("axis.1.in-position") \
-#    ))
-#  ui.s.addstr(13,0, "Y jog- enable:1 vel-mode:1 kb-jog:1 cnts:%9d scale:%9.6f pos:%9.6f"% (\
-#    hal.get_value("axis.1.jog-enable"), \
-#    hal.get_value("axis.1.jog-vel-mode"), \
-#    hal.get_value("axis.1.kb-jog-active"), \
-#    hal.get_value("axis.1.jog-counts"), \
-#    hal.get_value("axis.1.jog-scale"), \
-#    hal.get_value("axis.1.jog-cmd-pos") \
-#    ))
-#  ui.s.addstr(14,0, "Y backlash- corr:%9.6f filt:%9.6f vel:%9.6f"% (\
-#    hal.get_value("axis.1.backlash-corr"), \
-#    hal.get_value("axis.1.backlash-filt"), \
-#    hal.get_value("axis.1.backlash-vel") \
-#    ))
-#  ui.s.addstr(15,0, "Y motor- pos:%9.6f fb:%9.6f limits hard -%1d/+%1d switch -%1d/+%1d wheel:%1d"% (\
-#    hal.get_value("axis.1.motor-pos-cmd"), \
-#    hal.get_value("axis.1.motor-pos-fb"), \
-#    hal.get_value("axis.1.neg-hard-limit"), \
-#    hal.get_value("axis.1.pos-hard-limit"), \
-#    hal.get_value("axis.1.neg-lim-sw-in"), \
-#    hal.get_value("axis.1.pos-lim-sw-in"), \
-#    hal.get_value("axis.1.wheel-jog-active") \
-#    ))
-#  ui.s.addstr(16,0, "Z active:%1d a-enable:%1d a-fault:%1d err:%1d flt:%1d h-sw:%1d homed:%1d homing:%1d in-pos:%1d"% (\
-#    hal.get_value("axis.2.active"), \
-#    hal.get_value("axis.2.amp-enable-out"), \
-#    hal.get_value("axis.2.amp-fault-in"), \
-#    hal.get_value("axis.2.error"), \
-#    hal.get_value("axis.2.faulted"), \
-#    hal.get_value("axis.2.home-sw-in"), \
-#    hal.get_value("axis.2.homed"), \
-#    hal.get_value("axis.2.homing"), \
-#    hal.get_value("axis.2.in-position") \
-#    ))
-#  ui.s.addstr(17,0, "Z jog- enable:1 vel-mode:1 kb-jog:1 cnts:%9d scale:%9.6f pos:%9.6f"% (\
-#    hal.get_value("axis.2.jog-enable"), \
-#    hal.get_value("axis.2.jog-vel-mode"), \
-#    hal.get_value("axis.2.kb-jog-active"), \
-#    hal.get_value("axis.2.jog-counts"), \
-#    hal.get_value("axis.2.jog-scale"), \
-#    hal.get_value("axis.2.jog-cmd-pos") \
-#    ))
-#  ui.s.addstr(18,0, "Z backlash- corr:%9.6f filt:%9.6f vel:%9.6f"% (\
-#    hal.get_value("axis.2.backlash-corr"), \
-#    hal.get_value("axis.2.backlash-filt"), \
-#    hal.get_value("axis.2.backlash-vel") \
-#    ))
-#  ui.s.addstr(19,0, "Z motor- pos:%9.6f fb:%9.6f limits hard -%1d/+%1d switch -%1d/+%1d wheel:%1d"% (\
-#    hal.get_value("axis.2.motor-pos-cmd"), \
-#    hal.get_value("axis.2.motor-pos-fb"), \
-#    hal.get_value("axis.2.neg-hard-limit"), \
-#    hal.get_value("axis.2.pos-hard-limit"), \
-#    hal.get_value("axis.2.neg-lim-sw-in"), \
-#    hal.get_value("axis.2.pos-lim-sw-in"), \
-#    hal.get_value("axis.2.wheel-jog-active") \
-#    ))
-#  ui.s.addstr(20,0, "A active:%1d a-enable:%1d a-fault:%1d err:%1d flt:%1d h-sw:%1d homed:%1d homing:%1d in-pos:%1d"% (\
-#    hal.get_value("axis.2.active"), \
-#    hal.get_value("axis.2.amp-enable-out"), \
-#    hal.get_value("axis.2.amp-fault-in"), \
-#    hal.get_value("axis.2.error"), \
-#    hal.get_value("axis.2.faulted"), \
-#    hal.get_value("axis.2.home-sw-in"), \
-#    hal.get_value("axis.2.homed"), \
-#    hal.get_value("axis.2.homing"), \
-#    hal.get_value("axis.2.in-position") \
-#    ))
-#  ui.s.addstr(21,0, "A jog- enable:1 vel-mode:1 kb-jog:1 cnts:%9d scale:%9.6f pos:%9.6f"% (\
-#    hal.get_value("axis.3.jog-enable"), \
-#    hal.get_value("axis.3.jog-vel-mode"), \
-#    hal.get_value("axis.3.kb-jog-active"), \
-#    hal.get_value("axis.3.jog-counts"), \
-#    hal.get_value("axis.3.jog-scale"), \
-#    hal.get_value("axis.3.jog-cmd-pos") \
-#    ))
-#  ui.s.addstr(22,0, "A backlash- corr:%9.6f filt:%9.6f vel:%9.6f"% (\
-#    hal.get_value("axis.3.backlash-corr"), \
-#    hal.get_value("axis.3.backlash-filt"), \
-#    hal.get_value("axis.3.backlash-vel") \
-#    ))
-#  ui.s.addstr(23,0, "A motor- pos:%9.6f fb:%9.6f limits hard -%1d/+%1d switch -%1d/+%1d wheel:%1d"% (\
-#    hal.get_value("axis.3.motor-pos-cmd"), \
-#    hal.get_value("axis.3.motor-pos-fb"), \
-#    hal.get_value("axis.3.neg-hard-limit"), \
-#    hal.get_value("axis.3.pos-hard-limit"), \
-#    hal.get_value("axis.3.neg-lim-sw-in"), \
-#    hal.get_value("axis.3.pos-lim-sw-in"), \
-#    hal.get_value("axis.3.wheel-jog-active") \
-#    ))
-  ui.s.addstr(1,0,"hal.get_value not implemented; no status info.")
+  # hal.get_value() currently not implemented in the halmodule of
+  # machinekit; show the readout whenever a hal module provides it
+  if not hasattr(hal, "get_value"):
+    put(1,0,"hal.get_value not implemented; no status info.")
+    return
+  gv = hal.get_value
+  for (row, fmt, pins) in _STATUS_ROWS:
+    put(row,0, fmt % tuple(gv(p) for p in pins))
   # done with status screen
 
 
@@ -904,11 +925,11 @@ def status_tab():
 ## Tool tab - list the tool table
 def tool_tab():
   global ui
-  row = 1; cols = [0,28,54];
+  cols = [0,28,54];
   for i in range(len(cols)):
-    ui.s.addstr(1,cols[i], " #  Diameter  Length")
+    put(1,cols[i], " #  Diameter  Length")
   if len(ui.tools)<1:
-    ui.s.addstr(2,0, "No tools in tool table!")
+    put(2,0, "No tools in tool table!")
     return
   N = len(ui.tools)-ui.tool_start
   if N<0:
@@ -916,11 +937,15 @@ def tool_tab():
     if ui.tool_start < 0: ui.tool_start=0
     N = len(ui.tools)-ui.tool_start
   if N>66: N=66
-  for i in range(N):
-    tool = ui.stat.tool_table[ui.tools[i+ui.tool_start]]
-    j = i%3
-    if j == 0: row += 1
-    ui.s.addstr(row,cols[j], "%3d %8.4f %8.4f"%(tool.id, tool.diameter, tool.zoffset))
+  # walk the grid row-major, 3 cells per row, blanking cells past the
+  # end of the table; no per-cell modulo or row bookkeeping
+  tools_fmt = ui.tools_fmt
+  start = ui.tool_start
+  i = 0
+  for row in range(2, 24):
+    for col in cols:
+      put(row,col, tools_fmt[start+i] if i < N else "")
+      i += 1
 
   # done with tool table
 
@@ -928,6 +953,51 @@ def tool_tab():
 ## dialog commands
 #
 
+# a dialog paints its own window over stdscr; the row cache still holds
+# the text underneath, so mark every stdscr line touched and repaint
+# immediately, or the dead dialog stays on the physical screen
+def _dialog_closed():
+  global ui
+  ui.s.touchwin()
+  cls()
+
+# program listing backed by a mmap of the file plus a line-offset
+# index; lines are decoded only when rendered, so opening a huge NC
+# file costs one index scan instead of a Python str object per line
+class ProgramListing:
+  def __init__(self, name):
+    fd = os.open(name, os.O_RDONLY)
+    try:
+      self.mm = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+    except ValueError: # empty file; bytes has the same interface
+      self.mm = b""
+    finally:
+      os.close(fd)
+    # offsets of line starts, with a sentinel at EOF
+    offsets = [0]
+    find = self.mm.find
+    pos = find(b"\n", 0)
+    while pos != -1:
+      offsets.append(pos+1)
+      pos = find(b"\n", pos+1)
+    size = len(self.mm)
+    if offsets[-1] != size: # no newline on the last line
+      offsets.append(size)
+    self.offsets = offsets
+    self.n = len(offsets) - 1
+
+  def __len__(self):
+    return self.n
+
+  def __bool__(self):
+    return self.n > 0
+
+  def __getitem__(self, i):
+    if i < 0 or i >= self.n:
+      raise IndexError(i)
+    offsets = self.offsets
+    return self.mm[offsets[i]:offsets[i+1]].decode("latin-1").rstrip("\r\n")
+
 # get program file name in dialog, then open it
 def open_program():
   global ui
@@ -937,40 +1007,43 @@ def open_program():
   buttons = ["Open", "Cancel"]
 
   cwd = os.getcwd()
-  while(1): # loop until cancel or file chosen
-    # fetch the file list
-    rawlist = os.listdir(cwd)
-    files = []
-    for f in rawlist:
-      if f[0] != ".":
-        files.append(f)
-    files.append("..")
-    files.sort()
-
-    (b, idx) = dialog.show(buttons, files)
-    if b == -1 or b == 1: # escape or cancel
-      return
-
-    # if name is a directory, fetch listing and restart
-    name = os.path.join(cwd, files[idx])
-    if os.path.isdir(name): # directory, so keep going
-      cwd = name
-      continue # next round
-
-    else: # file, so open it for read
-      try:
-        # send the command
-        ui.cmd.program_open(name)
-        # read file into buffer for display
-        # someday, this may be a problem if the file is larger than available RAM....
-        f = open(name, "rt")
-        ui.listing = f.readlines()
-        f.close()
-      except IOError: # trap IOError so we don't die from mistyped filename
-        ui.error_msg("Error opening file %s"%name)
-        ui.listing = None
-      return # terminate while loop
-  # end while loop
+  try:
+    while(1): # loop until cancel or file chosen
+      # fetch the file list in one scandir pass; the entries carry their
+      # directory flag, so no stat per selection later
+      is_dir = {"..": True}
+      with os.scandir(cwd) as it:
+        for e in it:
+          if e.name[0] != ".":
+            is_dir[e.name] = e.is_dir()
+      files = sorted(is_dir)
+
+      (b, idx) = dialog.show(buttons, files)
+      if b == -1 or b == 1: # escape or cancel
+        return
+
+      # if name is a directory, fetch listing and restart
+      name = os.path.join(cwd, files[idx])
+      if is_dir[files[idx]]: # directory, so keep going
+        cwd = name
+        continue # next round
+
+      else: # file, so open it for read
+        try:
+          # send the command
+          ui.cmd.program_open(name)
+          # map file into memory for display; the kernel pages in only
+          # what the listing actually renders
+          ui.listing = ProgramListing(name)
+          ui.listing_cache.clear()
+        except IOError: # trap IOError so we don't die from mistyped filename
+          ui.error_msg("Error opening file %s"%name)
+          ui.listing = None
+          ui.listing_cache.clear()
+        return # terminate while loop
+    # end while loop
+  finally:
+    _dialog_closed()
 
 
 # set X,Y,Z,A offset directly
@@ -980,11 +1053,12 @@ def set_coord_offset():
   prompt = "Enter axis letter, then new value for axis position; e.g. \n\
     X4.5 sets the current X position to 4.5. May set X, Y, Z, A in one\n \
     line.\nSet:"
-  y = ((ui.maxy - 4)/2)-2
-  x = ((ui.maxx - 4)/2)-35
+  y = ((ui.maxy - 4)//2)-2
+  x = ((ui.maxx - 4)//2)-35
   dialog = curses_dialog.DialogEntryBox(y,x, 6,70, "Set Current Position")
   buttons = ["Set", "Cancel"]
   (b, string) = dialog.show(buttons, prompt)
+  _dialog_closed()
 
   if b == -1 or b == 1:
     # escape or cancel
@@ -1004,10 +1078,16 @@ def set_coord_offset():
 def parse_tools():
   global ui
 
+  ui.tool_serial += 1 # force the tool tab to redraw
   ui.tools = []
+  ui.tools_fmt = []
   for i in range(1,len(ui.stat.tool_table)):
-    if ui.stat.tool_table[i].id != -1:
+    tool = ui.stat.tool_table[i]
+    if tool.id != -1:
       ui.tools.append(i) # store index for tool listing
+      # format the row now; the table only changes on reload, so the
+      # tab then just indexes ready-made strings
+      ui.tools_fmt.append("%3d %8.4f %8.4f"%(tool.id, tool.diameter, tool.zoffset))
 
 # get line of input for mdi command
 def mdi_input():
@@ -1015,11 +1095,12 @@ def mdi_input():
 
   # create a dialog
   prompt = "MDI:"
-  y = ((ui.maxy - 4)/2)-2
-  x = ((ui.maxx - 4)/2)-35
+  y = ((ui.maxy - 4)//2)-2
+  x = ((ui.maxx - 4)//2)-35
   dialog = curses_dialog.DialogEntryBox(y,x, 4,70, "MDI Command")
   buttons = ["Send", "Cancel"]
   (b, mdi) = dialog.show(buttons, prompt)
+  _dialog_closed()
 
   if b == -1 or b == 1:
     # escape or cancel
@@ -1040,8 +1121,8 @@ def prev_screen():
   ui.tab = ui.tab - 1
   if ui.tab < 0:
     ui.tab = len(ui.tabs)-1;
+  ui.row_cache.clear()
   ui.s.clear()
-  ui.s.redrawwin()
   cls()
 
 # swap screen to next in list, wrapping at end
@@ -1050,8 +1131,8 @@ def next_screen():
   ui.tab = ui.tab + 1
   if ui.tab > len(ui.tabs)-1:
     ui.tab = 0;
+  ui.row_cache.clear()
   ui.s.clear()
-  ui.s.redrawwin()
   cls()
 
 
@@ -1081,8 +1162,7 @@ except:
     curses.endwin()
   except:
     pass
-  sys.stderr.write("CNCTERM: FATAL ERROR: Unhandled exception!  Shut it down!\n")
-  sys.stderr.write("\n")
+  sys.stderr.write("CNCTERM: FATAL ERROR: Unhandled exception!  Shut it down!\n\n")
   traceback.print_exception(exctype, excval, exctb)
   rc = 1
 
@@ -26,7 +26,7 @@
 #
 
 import curses
-import string
+from bisect import bisect_right
 
 UP = 1
 DOWN = 2
@@ -40,9 +40,63 @@ HOME = 9
 END = 10
 BACKSPACE = 11
 
+# keystroke tables for DialogBox.get_cmd: direct codes, then the
+# final bytes of the xterm CSI and SS3 escape sequences
+_KEY_TABLE = {
+  ord('\n'): SELECT,
+  ord('['): HOME,
+  ord(']'): END,
+  127: BACKSPACE, # delete
+  8: BACKSPACE, # backspace
+  # terminfo-decoded keys, delivered when the window is in keypad mode;
+  # the manual ESC parser below stays as a fallback
+  curses.KEY_ENTER: SELECT,
+  curses.KEY_UP: UP,
+  curses.KEY_DOWN: DOWN,
+  curses.KEY_RIGHT: RIGHT,
+  curses.KEY_LEFT: LEFT,
+  curses.KEY_PPAGE: PGUP,
+  curses.KEY_NPAGE: PGDN,
+  curses.KEY_HOME: HOME,
+  curses.KEY_END: END,
+  curses.KEY_BACKSPACE: BACKSPACE,
+  curses.KEY_DC: BACKSPACE, # delete key; entry box has no cursor anyway
+}
+_ESC_TABLE = {
+  ord('A'): UP,
+  ord('B'): DOWN,
+  ord('C'): RIGHT,
+  ord('D'): LEFT,
+  ord('5'): PGUP,
+  ord('6'): PGDN,
+}
+_ESC_O_TABLE = {
+  ord('H'): HOME,
+  ord('F'): END,
+}
+
+# wrap text at word boundaries into lines no wider than w; one linear
+# scan, no per-character list juggling
+def _wrap(text, w):
+  lines = []
+  for raw in text.split('\n'):
+    while len(raw) > w:
+      k = raw.rfind(' ', 0, w+1)
+      if k <= 0: # no space to break at; hard wrap
+        lines.append(raw[:w])
+        raw = raw[w:]
+      else:
+        lines.append(raw[:k])
+        raw = raw[k+1:]
+    lines.append(raw)
+  return lines
+
 class DialogBox:
   def __init__(self, y,x, h,w, title):
     self.win = curses.newwin(h,w,y,x)
+    # let curses decode special keys via terminfo instead of relying
+    # only on the hard-coded xterm sequences in get_cmd
+    self.win.keypad(True)
     self.title = title
     self.w = w-2
     self.h = h-2
@@ -55,45 +109,20 @@ class DialogBox:
     if not buttons:
       return -1
     # wrap the text at words
-    lines = 0
-    j = 0; k = -1; msg=[]
-    for i in range(len(text)):
-      j = j+1
-      if text[i] == ' ':
-	k = i
-      if text[i] == '\n':
-	j = 0; k = -1
-	lines = lines+1
-      if j > self.w:
-	lines = lines+1
-	j = 0
-	# replace last space with \n
-	if k == -1:
-	  msg.insert(self.w-1,'\n')
-	else:
-	  if k == i:
-	    msg.append(text[i])
-	  msg.insert(k, '\n')
-      else:
-	msg.append(text[i])
-    if lines > self.h:
-      lines = self.h
+    msg = _wrap(text, self.w)
 
     # draw the dialog
     self.win.clear()
     self.win.box()
     self.win.addstr(0,2, self.title[0:self.w-2], curses.A_STANDOUT)
 
-    # draw the message
-    #   parse msg for \n, incrementing lines
-    y = 1; x = 1;
-    for i in range(len(msg)):
-      if msg[i] == '\n':
-	y = y+1; x = 1
-	if y > self.h:
-	  break
-      self.win.addch(y,x,ord(msg[i]), curses.A_NORMAL)
-      x = x+1
+    # draw the message, one addstr per wrapped line
+    y = 1
+    for line in msg:
+      if y > self.h:
+        break
+      self.win.addstr(y,1, line, curses.A_NORMAL)
+      y = y+1
     # draw the buttons
     #  compute # of buttons, then cut up lowest line, and center
     #  add <> around buttons
@@ -101,98 +130,65 @@ class DialogBox:
     current_b = default
     y = self.h
     nb = len(buttons)
-    dx = self.w/nb
-    x0 = dx/2
+    # button geometry never changes while the dialog is up, so compute
+    # the strings and columns once (integer math; these are coordinates)
+    dx = self.w//nb
+    x0 = dx//2
+    button_strs = ["<"+b+">" for b in buttons]
+    button_xs = [((i+1)*dx)-x0-((len(buttons[i])+2)//2) for i in range(nb)]
     # draw the buttons - assume they won't overlap
-    for i in range(len(buttons)):
+    for i in range(nb):
       if current_b == i:
-	highlight = curses.A_STANDOUT
+        highlight = curses.A_STANDOUT
       else:
-	highlight = curses.A_NORMAL
-      offset = (len(buttons[i])+2) / 2
-      self.win.addstr(y, ((i+1)*dx)-x0-offset, "<"+buttons[i]+">", highlight)
-
-    self.win.box()
-    self.win.addstr(0,2, self.title[0:self.w-2], curses.A_STANDOUT)
+        highlight = curses.A_NORMAL
+      self.win.addstr(y, button_xs[i], button_strs[i], highlight)
 
     # run our busy wait loop to get keyboard input
     while (1):
       c = self.get_cmd()
       if c == LEFT:
-	current_b = current_b-1
-	if current_b < 0:
-	  current_b = len(buttons)-1
+        current_b = current_b-1
+        if current_b < 0:
+          current_b = len(buttons)-1
       elif c == RIGHT:
         current_b = current_b+1
         if current_b > len(buttons)-1:
-	  current_b = 0
+          current_b = 0
       elif c == SELECT:
-	return current_b
+        return current_b
       elif c == ESCAPE:
-	return (-1, -1)
-
-      # redraw the buttons
-      self.win.move(y,1)
-      self.win.clrtoeol()
-      self.win.box()
-      self.win.addstr(0,2, self.title[0:self.w-2], curses.A_STANDOUT)
-      for i in range(len(buttons)):
-	if current_b == i:
-	  highlight = curses.A_STANDOUT
-	else:
-	  highlight = curses.A_NORMAL
-	offset = (len(buttons[i])+2) / 2
-	self.win.addstr(y, ((i+1)*dx)-x0-offset, "<"+buttons[i]+">", highlight)
+        return (-1, -1)
+
+      # redraw the buttons in place; the box and title are static and
+      # the button cells cover their previous contents exactly
+      for i in range(nb):
+        if current_b == i:
+          highlight = curses.A_STANDOUT
+        else:
+          highlight = curses.A_NORMAL
+        self.win.addstr(y, button_xs[i], button_strs[i], highlight)
 
   def get_cmd(self):
-    # get a keystroke and parse into cmd codes
+    # get a keystroke and parse into cmd codes; table lookups instead
+    # of an if/elif chain per key
     self.win.nodelay(0)
     c = self.win.getch()
-    if c == ord('\n'):
-      # return = select
-      return SELECT
-    elif chr(c&0xff) == '[':
-      return HOME;
-    elif chr(c&0xff) == ']':
-      return END;
-    # test for printable ASCII
-    elif c&0xff > 31 and c&0xff < 127:
-      return 1000 + (c&0xff) - 32
-
-    elif c == 127 or c == 8: # 127 is decimal for delete, 8 is decimal
-      return BACKSPACE	     # for backspace
-    elif c == 27: # 27 is decimal for ESC
+    cmd = _KEY_TABLE.get(c)
+    if cmd is not None:
+      return cmd
+    # test for printable ASCII on the raw code; masking with 0xff would
+    # alias unmapped terminfo keys (KEY_DC etc., all > 255) into letters
+    if c > 31 and c < 127:
+      return 1000 + c - 32
+    if c == 27: # 27 is decimal for ESC; parse the escape sequence
       c = self.win.getch()
       if c == ord('['):
-	# movement key
-	c = self.win.getch()
-	# up is A
-	if c == ord('A'):
-	  return UP
-	# down is B
-	if c == ord('B'):
-	  return DOWN
-	# right is C
-	if c == ord('C'):
-	  return RIGHT
-	# left is D
-	if c == ord('D'):
-	  return LEFT
-	# pgup is 5
-	if c == ord('5'):
-	  return PGUP
-	# pgdn is 6
-	if c == ord('6'):
-	  return PGDN
+        # movement key
+        return _ESC_TABLE.get(self.win.getch(), 0)
       elif c == ord('O'):
-	# Home/End
-	c = self.win.getch()
-	# home is H
-	if c == ord('H'):
-	  return HOME
-	elif c == ord('F'):
-	  return END
-    
+        # Home/End
+        return _ESC_O_TABLE.get(self.win.getch(), 0)
     return 0
 
 
@@ -211,81 +207,100 @@ class DialogListBox(DialogBox):
     for i in range(len(list)):
       entries.append([str(list[i]), curses.A_NORMAL])
 
+    # first letter -> ascending indices, for letter-jump keystrokes
+    first_idx = {}
+    for i in range(len(entries)):
+      if entries[i][0]:
+        first_idx.setdefault(entries[i][0][0].lower(), []).append(i)
+
     entries[cursor_indx][1] = curses.A_STANDOUT
 
     current_b = default
+    # button geometry never changes while the dialog is up
+    y = self.h
+    nb = len(buttons)
+    dx = self.w//nb
+    x0 = dx//2
+    button_strs = ["<"+b+">" for b in buttons]
+    button_xs = [((i+1)*dx)-x0-((len(buttons[i])+2)//2) for i in range(nb)]
+
+    # draw the static frame once; only the list area and the buttons
+    # change while the dialog is up
+    self.win.erase()
+    self.win.box()
+    self.win.addstr(0,2, self.title[0:self.w-2], curses.A_STANDOUT)
+    blank = " "*self.w
+
     # run our busy wait loop to get keyboard input
     while (1):
       ## Assume will diplay h - 1 entries
       item_disp_ct = self.h - 1
 
-      # draw the dialog
-      self.win.erase()	# note that this doesn't actually empty evert cell!
-      self.win.box()
-      self.win.addstr(0,2, self.title[0:self.w-2], curses.A_STANDOUT)
-
       # draw the message
       # we use "..." at top and bottom to replace scroll bars
       # fill with first self.h items
       j = 1
       ## Put a '...' if there are items "off the top"
       if start_indx > 0:
-	self.win.addstr(1,1, "...", curses.A_NORMAL)
-	item_disp_ct = item_disp_ct - 1
-	j = j+1
+        self.win.addstr(1,1, "...".ljust(self.w), curses.A_NORMAL)
+        item_disp_ct = item_disp_ct - 1
+        j = j+1
 
       ## Figure out index of last item in display
       last_item_indx = start_indx + item_disp_ct
 
       ## Adjust last_item_indx for a short list
+      more_below = 0
       if last_item_indx > len(entries):
         last_item_indx = len(entries)
         item_disp_ct = last_item_indx - start_indx
       else:
-	last_item_indx = last_item_indx - 1
-	item_disp_ct = item_disp_ct - 1
-	self.win.addstr(self.h-1, 1, "...", curses.A_NORMAL)
+        last_item_indx = last_item_indx - 1
+        item_disp_ct = item_disp_ct - 1
+        more_below = 1
 
+      # each row is padded to the list width, so leftovers from the
+      # previous frame are overwritten without erasing the window
       for i in range(start_indx, last_item_indx):
-	self.win.addstr(j, 1, entries[i][0], entries[i][1])
-	j = j + 1
-
-      # draw the buttons
-      #  compute # of buttons, then cut up lowest line, and center
-      #  add <> around buttons
+        self.win.addstr(j, 1, entries[i][0][:self.w].ljust(self.w), entries[i][1])
+        j = j + 1
+      while j < self.h: # blank unused rows
+        self.win.addstr(j, 1, blank)
+        j = j + 1
+      if more_below:
+        ## Put a '...' if there are items "off the bottom"
+        self.win.addstr(self.h-1, 1, "...", curses.A_NORMAL)
+
+      # draw the buttons - assume they won't overlap
       #  selected button is standout, other normal
-      y = self.h
-      nb = len(buttons)
-      dx = self.w/nb
-      x0 = dx/2
-      # paint the buttons - assume they won't overlap
-      for i in range(len(buttons)):
-	if current_b == i:
-	  highlight = curses.A_STANDOUT
-	else:
-	  highlight = curses.A_NORMAL
-	offset = (len(buttons[i])+2) / 2
-	self.win.addstr(y, ((i+1)*dx)-x0-offset, "<"+buttons[i]+">", highlight)
-
-      self.win.refresh()
+      for i in range(nb):
+        if current_b == i:
+          highlight = curses.A_STANDOUT
+        else:
+          highlight = curses.A_NORMAL
+        self.win.addstr(y, button_xs[i], button_strs[i], highlight)
+
+      # stage the window and flush the whole frame in one burst
+      self.win.noutrefresh()
+      curses.doupdate()
 
       # wait for keystroke
       c = self.get_cmd()
       # change selected button
       if c == LEFT:
-	current_b = current_b-1
-	if current_b < 0:
-	  current_b = len(buttons)-1
+        current_b = current_b-1
+        if current_b < 0:
+          current_b = len(buttons)-1
       elif c == RIGHT:
         current_b = current_b+1
         if current_b > len(buttons)-1:
-	  current_b = 0
+          current_b = 0
       elif c == SELECT:
-	self.win.erase()
-	return (current_b, cursor_indx)
+        self.win.erase()
+        return (current_b, cursor_indx)
       elif c == ESCAPE:
-	self.win.erase()
-	return (-1, -1)
+        self.win.erase()
+        return (-1, -1)
 
       ### Remainder of entries manipulate the
       ### display in some way, so first, we
@@ -294,36 +309,29 @@ class DialogListBox(DialogBox):
       entries[cursor_indx][1] = curses.A_NORMAL
 
       if c == UP:
-	cursor_indx = cursor_indx - 1
+        cursor_indx = cursor_indx - 1
       elif c == DOWN:
-	cursor_indx = cursor_indx + 1
+        cursor_indx = cursor_indx + 1
       elif c == PGDN:
-	# Down one "page"
-	cursor_indx = cursor_indx + item_disp_ct
+        # Down one "page"
+        cursor_indx = cursor_indx + item_disp_ct
       elif c == PGUP:
-	# up one page
-	cursor_indx = cursor_indx - item_disp_ct
+        # up one page
+        cursor_indx = cursor_indx - item_disp_ct
       elif c == HOME:
-	# go to beginning
-	cursor_indx = 0
+        # go to beginning
+        cursor_indx = 0
       elif c == END:
-	cursor_indx = len(entries) - 1
+        cursor_indx = len(entries) - 1
 
       elif c >= 1000:
-        jumpTo = string.lower(chr(32 + (c - 1000)))
-        Match = 0
-        ## Search forward from our index for a match
-        for i in range(cursor_indx+1, len(entries)):
-          if (string.lower(entries[i][0][0]) == jumpTo):
-            cursor_indx = i
-            Match = 1
-            break
-        ## No?  try from the beginning of the list
-        if not Match:
-          for i in range(cursor_indx):
-            if (string.lower(entries[i][0][0]) == jumpTo):
-              cursor_indx = i
-              break
+        jumpTo = chr(32 + (c - 1000)).lower()
+        ## next entry with that first letter, wrapping to the start;
+        ## one bisect into the prebuilt index instead of a list scan
+        cand = first_idx.get(jumpTo)
+        if cand:
+          i = bisect_right(cand, cursor_indx)
+          cursor_indx = cand[i] if i < len(cand) else cand[0]
 
       ### Since the command might push stuff off
       ### one edge or the other, fix things up
@@ -332,16 +340,15 @@ class DialogListBox(DialogBox):
         cursor_indx = 0
       if cursor_indx >= len(entries):
         cursor_indx = len(entries) - 1
+      # no clear()/refresh() here: the erase at the top of the loop
+      # blanks the in-memory window and one doupdate flushes the frame,
+      # so scrolling costs a single burst instead of two
       if cursor_indx < start_indx: 
-        start_indx = cursor_indx - (item_disp_ct / 2)
-        self.win.clear()	# erase the window
-	self.win.refresh()
+        start_indx = cursor_indx - (item_disp_ct // 2)
         if start_indx < 0:
           start_indx = 0
       if cursor_indx >= start_indx + item_disp_ct:
-        start_indx = cursor_indx - (item_disp_ct / 2)
-        self.win.clear()	# erase the window
-	self.win.refresh()
+        start_indx = cursor_indx - (item_disp_ct // 2)
         if start_indx < 0:
           start_indx = 0
 
@@ -359,47 +366,25 @@ class DialogEntryBox(DialogBox):
       return -1
     w = self.w+1
     # wrap the text at words
-    lines = 0
-    j = 0; k = -1; msg=[]
-    for i in range(len(text)):
-      j = j+1
-      if text[i] == ' ':
-	k = i
-      if text[i] == '\n':
-	j = 0; k = -1
-	lines = lines+1
-      if j > w:
-	lines = lines+1
-	j = 0
-	# replace last space with \n
-	if k == -1:
-	  msg.insert(self.w-1,'\n')
-	else:
-	  if k == i:
-	    msg.append(text[i])
-	  msg.insert(k, '\n')
-      else:
-	msg.append(text[i])
-    if lines > self.h:
-      lines = self.h
+    msg = _wrap(text, w)
 
     # draw the dialog
     self.win.erase()
     self.win.box()
     self.win.addstr(0,2, self.title[0:self.w-2], curses.A_STANDOUT)
 
-    # draw the message
-    #   parse msg for \n, incrementing lines
-    y = 1; x = 1;
-    for i in range(len(msg)):
-      if msg[i] == '\n':
-	y = y+1; x = 1
-	if y > self.h:
-	  break
-      self.win.addch(y,x,ord(msg[i]), curses.A_NORMAL)
-      x = x+1
-    # store the position to start entering text
-    ey = y; ex = x
+    # draw the message, one addstr per wrapped line
+    y = 1
+    for line in msg:
+      if y > self.h:
+        break
+      self.win.addstr(y,1, line, curses.A_NORMAL)
+      y = y+1
+    # store the position to start entering text: just past the prompt
+    if msg:
+      ey = y-1; ex = 1+len(msg[-1])
+    else:
+      ey = 1; ex = 1
     if ex >= w:
       ex = 1; ey = ey+1
     if ey > self.h:
@@ -412,61 +397,53 @@ class DialogEntryBox(DialogBox):
     current_b = default
     y = self.h
     nb = len(buttons)
-    dx = w/nb
-    x0 = dx/2
+    # button geometry never changes while the dialog is up
+    dx = w//nb
+    x0 = dx//2
+    button_strs = ["<"+b+">" for b in buttons]
+    button_xs = [((i+1)*dx)-x0-((len(buttons[i])+2)//2) for i in range(nb)]
     # draw the buttons - assume they won't overlap
-    for i in range(len(buttons)):
+    for i in range(nb):
       if current_b == i:
-	highlight = curses.A_STANDOUT
+        highlight = curses.A_STANDOUT
       else:
-	highlight = curses.A_NORMAL
-      offset = (len(buttons[i])+2) / 2
-      self.win.addstr(y, ((i+1)*dx)-x0-offset, "<"+buttons[i]+">", highlight)
-
-    self.win.box()
-    self.win.addstr(0,2, self.title[0:self.w-2], curses.A_STANDOUT)
+        highlight = curses.A_NORMAL
+      self.win.addstr(y, button_xs[i], button_strs[i], highlight)
 
     entry_val = ""
     # run our busy wait loop to get keyboard input
     while (1):
       c = self.get_cmd()
       if c == LEFT:
-	current_b = current_b-1
-	if current_b < 0:
-	  current_b = len(buttons)-1
+        current_b = current_b-1
+        if current_b < 0:
+          current_b = len(buttons)-1
       elif c == RIGHT:
         current_b = current_b+1
         if current_b > len(buttons)-1:
-	  current_b = 0
+          current_b = 0
       elif c == SELECT:
-	return (current_b, entry_val)
+        return (current_b, entry_val)
       elif c == ESCAPE:
-	return (-1, -1)
+        return (-1, -1)
       elif c == BACKSPACE:
-	if entry_val:
-	  entry_val = entry_val[0:len(entry_val)-1]
+        if entry_val:
+          entry_val = entry_val[0:len(entry_val)-1]
       elif c >= 1000:
         char = chr(32 + (c - 1000))
         entry_val = entry_val+char
 
-      # redraw the changeable bits of the dialog
-      self.win.move(y,1)
-      self.win.clrtoeol()
-      self.win.move(ey,ex)
-      self.win.clrtoeol()
-      self.win.box()
-      self.win.addstr(0,2, self.title[0:self.w-2], curses.A_STANDOUT)
-      for i in range(len(buttons)):
-	if current_b == i:
-	  highlight = curses.A_STANDOUT
-	else:
-	  highlight = curses.A_NORMAL
-	offset = (len(buttons[i])+2) / 2
-	self.win.addstr(y, ((i+1)*dx)-x0-offset, "<"+buttons[i]+">", highlight)
-      #   echo the current entry_val
+      # redraw the changeable bits of the dialog: the buttons and the
+      # entry field; the box and title are static
+      for i in range(nb):
+        if current_b == i:
+          highlight = curses.A_STANDOUT
+        else:
+          highlight = curses.A_NORMAL
+        self.win.addstr(y, button_xs[i], button_strs[i], highlight)
+      #   echo the current entry_val, padded to cover deleted chars
       if len(entry_val) + ex > w:
-	display_val = entry_val[len(entry_val)-(w-ex):len(entry_val)]
+        display_val = entry_val[len(entry_val)-(w-ex):len(entry_val)]
       else:
-	display_val = entry_val
-      for i in range(len(display_val)):
-	self.win.addch(ey, ex+i, ord(display_val[i]), curses.A_NORMAL)
+        display_val = entry_val
+      self.win.addstr(ey, ex, display_val + " "*(w-ex-len(display_val)), curses.A_NORMAL)
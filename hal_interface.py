@@ -1,13 +1,50 @@
 # HAL interface for cncterm 
 
 
-import linuxcnc # for constants in poll()
+# bind the constants used per tick directly; also for poll(), where a
+# module attribute lookup per compare adds up at the poll rate
+from linuxcnc import INTERP_IDLE, MODE_AUTO, MODE_MANUAL, \
+    AUTO_STEP, AUTO_RUN, AUTO_PAUSE, AUTO_RESUME
 import hal
 
+# action codes returned by _poll_core
+ACT_NONE = 0
+ACT_PAUSE = 1 # pause running program (single-block switched on)
+ACT_RESUME = 2 # resume running program (single-block switched off)
+ACT_STEP_PAUSED = 3 # cycle-start while paused, single-block on
+ACT_RESUME_PAUSED = 4 # cycle-start while paused, single-block off
+ACT_RUN_STEP = 5 # cycle-start while idle, single-block on
+ACT_RUN = 6 # cycle-start while idle, single-block off
+ACT_ABORT = 7 # abort everything
+
+# decide what poll() should do, from plain ints only; keeping the
+# branchy logic free of HAL and NML objects makes it trivially testable
+# and compilable (mypyc/Cython) if the tick rate ever demands it.
+# returns (single-block action, cycle-start action).
+def _poll_core(abort, prev_abort, singleblock, prev_singleblock,
+               cyclestart, prev_cyclestart, paused, queue, interp_idle):
+    # an abort edge preempts everything else this tick
+    if abort and not prev_abort:
+        return (ACT_ABORT, ACT_NONE)
+    sb = ACT_NONE
+    if (singleblock ^ prev_singleblock) and (queue > 0 or paused):
+        sb = ACT_PAUSE if singleblock else ACT_RESUME
+    cs = ACT_NONE
+    if cyclestart and not prev_cyclestart:
+        if paused: # if paused, resume or step
+            cs = ACT_STEP_PAUSED if singleblock else ACT_RESUME_PAUSED
+        elif interp_idle: # if idle, run program
+            cs = ACT_RUN_STEP if singleblock else ACT_RUN
+    return (sb, cs)
+
 class HALInterface:
-    def __init__(self, cmd, stat):
-	self.cmd = cmd; # command channel for sending motion commands
-	self.stat = stat; # status channel from motion controller
+    # abort_action, if given, runs on the abort pin edge instead of a
+    # bare cmd.abort(); the UI passes cmds.abort so pending mode-switch
+    # follow-ups are dropped too
+    def __init__(self, cmd, stat, abort_action=None):
+        self.cmd = cmd; # command channel for sending motion commands
+        self.stat = stat; # status channel from motion controller
+        self._abort = abort_action or cmd.abort
         self.c = hal.component("cncterm")
         self.c.newpin("status-light", hal.HAL_BIT, hal.HAL_OUT)
         self.c.newpin("jog.active", hal.HAL_BIT, hal.HAL_OUT)
@@ -26,6 +63,7 @@ class HALInterface:
         self.c.newpin("wheel-counts", hal.HAL_S32, hal.HAL_IN)
         self.counts = 0
         self.jog_velocity = 1
+        self._auto = cmd.auto # bound once; used on every poll branch
         self.c.ready()
         self.active = 0 # jogging active?
 
@@ -36,10 +74,13 @@ class HALInterface:
         return ret
 
     def set_axis(self, n):
-        self.c["jog.wheel.x"] = n == 0 and self.active
-        self.c["jog.wheel.y"] = n == 1 and self.active
-        self.c["jog.wheel.z"] = n == 2 and self.active
-        self.c["jog.wheel.a"] = n == 3 and self.active
+        # one mask instead of four compare-and-ands
+        c = self.c
+        m = (1 << n) if self.active else 0
+        c["jog.wheel.x"] = m & 1
+        c["jog.wheel.y"] = m & 2
+        c["jog.wheel.z"] = m & 4
+        c["jog.wheel.a"] = m & 8
 
     def jog_step(self, inc):
         self.c["jog.wheel.increment"] = inc
@@ -48,51 +89,61 @@ class HALInterface:
         self.active = active
 
     def poll(self):
-        abort = self.c["abort"]
-        if abort and not self.abort:
-  	  self.cmd.abort()
-	  return
+        # read the pins once, let _poll_core pick the actions, then
+        # issue the matching commands
+        c = self.c
+        cmd = self.cmd
+        stat = self.stat
+        abort = c["abort"]
+        singleblock = c["single-block"]
+        cyclestart = c["cycle-start"]
+        interp_idle = stat.interp_state == INTERP_IDLE
+
+        (sb, cs) = _poll_core(abort, self.abort,
+          singleblock, self.singleblock, cyclestart, self.cyclestart,
+          stat.paused, stat.queue, interp_idle)
+
+        if sb == ACT_ABORT:
+          self._abort()
+          return
         self.abort = abort
 
-        singleblock = self.c["single-block"]
-	# if single block status changed, update the control
-        if singleblock ^ self.singleblock:
-	  if self.stat.queue > 0 or self.stat.paused:
-	    # program or mdi is running
-	    if singleblock:
-	      self.cmd.auto(self.emc.AUTO_PAUSE)
-	    else:
-	      self.auto(self.emc.AUTO_RESUME)
+        # single block status changed, so update the control
+        auto = self._auto
+        if sb == ACT_PAUSE:
+          auto(AUTO_PAUSE)
+        elif sb == ACT_RESUME:
+          auto(AUTO_RESUME)
         self.singleblock = singleblock
 
-	# if cyclestart status changed, update the control
-        cyclestart = self.c["cycle-start"]
-        if cyclestart and not self.cyclestart:
-	  if self.stat.paused: # if paused, resume or step
-	    if self.singleblock:
-	      self.cmd.auto(self.emc.AUTO_STEP)
-	    else:
-	      self.cmd.auto(self.emc.AUTO_RESUME)
-	    self.cyclestart = cyclestart
-	    return
-	  if self.stat.interp_state == linuxcnc.INTERP_IDLE: # if idle, run program
-	    self.cmd.mode(linuxcnc.MODE_AUTO)
-	    self.cmd.wait_complete()
-	    if self.singleblock: # run in single block
-	      self.cmd.auto(linuxcnc.AUTO_STEP)
-	    else:
-	      self.cmd.auto(linuxcnc.AUTO_RUN)
+        # cyclestart status changed, so update the control
+        if cs == ACT_STEP_PAUSED:
+          auto(AUTO_STEP)
+          self.cyclestart = cyclestart
+          return
+        elif cs == ACT_RESUME_PAUSED:
+          auto(AUTO_RESUME)
+          self.cyclestart = cyclestart
+          return
+        elif cs == ACT_RUN_STEP: # run in single block
+          cmd.mode(MODE_AUTO)
+          cmd.wait_complete()
+          auto(AUTO_STEP)
+        elif cs == ACT_RUN:
+          cmd.mode(MODE_AUTO)
+          cmd.wait_complete()
+          auto(AUTO_RUN)
         self.cyclestart = cyclestart
 
-        self.c["jog.active"] = self.stat.task_mode == linuxcnc.MODE_MANUAL
+        c["jog.active"] = stat.task_mode == MODE_MANUAL
 
-        if self.stat.paused:
+        if stat.paused:
             # blink
-            self.c["status-light"] = not self.c["status-light"]
+            c["status-light"] = c["status-light"] ^ 1
         else:
-            if self.stat.queue > 0 or self.stat.interp_state != linuxcnc.INTERP_IDLE:
+            if stat.queue > 0 or not interp_idle:
                 # something is running
-                self.c["status-light"] = 1
+                c["status-light"] = 1
             else:
                 # nothing is happening
-                self.c["status-light"] = 0
+                c["status-light"] = 0